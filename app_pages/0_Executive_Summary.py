@@ -0,0 +1,159 @@
+import streamlit as st
+from utils import enter_page, start_section, show_section_timings, load_data, aggregate_only, create_sidebar, slice_periods, create_page_navigation, load_daily_cube, cube_share, cube_counts, load_prefix_sums, range_total, safe_mean
+
+
+try:
+    # Load data (in streaming mode only the aggregates exist, df is None)
+    df = None if aggregate_only() else load_data()
+    
+    # Set current page for navigation
+    enter_page('Executive Summary')
+    
+    # Create sidebar
+    current_start, current_end, prev_start, prev_end, comparison_label, prev_custom_start, selected_hospitals = create_sidebar(df)
+    
+    # Create navigation
+    create_page_navigation()
+    
+    start_section('KPIs')
+
+    # KPIs are computed from the pre-aggregated daily cube instead of patient rows
+    cube = load_daily_cube(df)
+
+    # Slice the current and previous periods out of the date-sorted cube
+    cube_current, cube_prev = slice_periods(
+        cube, current_start, current_end, prev_start, prev_end, selected_hospitals
+    )
+
+    # Patient, billing and stay totals come straight from the running sums
+    prefix = load_prefix_sums(df)
+    current_totals = range_total(prefix, current_start, current_end, selected_hospitals)
+    if prev_start is not None and prev_end is not None:
+        prev_totals = range_total(prefix, prev_start, prev_end, selected_hospitals)
+    else:
+        prev_totals = None
+    
+    # Executive Summary content
+    st.markdown("""<h3 class="sub">KPIs:</h3>""", unsafe_allow_html=True)
+    
+
+    # Calculate metrics for current period
+    total_patients = current_totals['Patient_Count']
+    avg_length_of_stay = safe_mean(current_totals['Total_Stay'], current_totals['Stay_Count'])
+    avg_treatment_cost = safe_mean(current_totals['Total_Billing'], current_totals['Billing_Count'])
+    elective_admission_pct = cube_share(cube_current, 'Admission Type', 'Elective')
+    inconclusive_pct = cube_share(cube_current, 'Test Results', 'Inconclusive')
+    
+    # Calculate metrics for previous period (if available)
+    if prev_totals is not None and prev_totals['Patient_Count'] > 0:
+        prev_avg_los = safe_mean(prev_totals['Total_Stay'], prev_totals['Stay_Count'])
+        prev_avg_cost = safe_mean(prev_totals['Total_Billing'], prev_totals['Billing_Count'])
+        prev_elective_pct = cube_share(cube_prev, 'Admission Type', 'Elective')
+        prev_inconclusive_pct = cube_share(cube_prev, 'Test Results', 'Inconclusive')
+        
+        # Calculate percent changes
+        los_change = ((avg_length_of_stay / prev_avg_los) - 1) * 100 if prev_avg_los > 0 else 0
+        cost_change = ((avg_treatment_cost / prev_avg_cost) - 1) * 100 if prev_avg_cost > 0 else 0
+        elective_change = elective_admission_pct - prev_elective_pct
+        inconclusive_change = inconclusive_pct - prev_inconclusive_pct
+    else:
+        prev_avg_los = None
+        prev_avg_cost = None
+        prev_elective_pct = None
+        prev_inconclusive_pct = None
+        los_change = 0
+        cost_change = 0
+        elective_change = 0
+        inconclusive_change = 0
+    
+    # Display metrics using custom HTML
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.markdown(f"""
+        <div class="kpi-container">
+            <div class="kpi-title">Avg Stay (days)</div>
+            <div class="kpi-value">{avg_length_of_stay:.1f}</div>
+            {f'<div class="kpi-{"up" if los_change > 0 else "down"}">{"▲" if los_change > 0 else "▼"} {abs(los_change):.1f}%</div>' if prev_avg_los is not None else ''}
+            {f'<div class="kpi-compare">{comparison_label}: {prev_avg_los:.1f}</div>' if prev_avg_los is not None else ''}
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(f"""
+        <div class="kpi-container">
+            <div class="kpi-title">Elective Admission %</div>
+            <div class="kpi-value">{elective_admission_pct:.1f}%</div>
+            {f'<div class="kpi-{"up" if elective_change > 0 else "down"}">{"▲" if elective_change > 0 else "▼"} {abs(elective_change):.1f}%</div>' if prev_elective_pct is not None else ''}
+            {f'<div class="kpi-compare">{comparison_label}: {prev_elective_pct:.1f}%</div>' if prev_elective_pct is not None else ''}
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown(f"""
+        <div class="kpi-container">
+            <div class="kpi-title">Avg Treatment Cost</div>
+            <div class="kpi-value">${avg_treatment_cost:,.0f}</div>
+            {f'<div class="kpi-{"down" if cost_change < 0 else "up"}">{"▼" if cost_change < 0 else "▲"} {abs(cost_change):.1f}%</div>' if prev_avg_cost is not None else ''}
+            {f'<div class="kpi-compare">{comparison_label}: ${prev_avg_cost:,.0f}</div>' if prev_avg_cost is not None else ''}
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col4:
+        st.markdown(f"""
+        <div class="kpi-container">
+            <div class="kpi-title">Inconclusive Results</div>
+            <div class="kpi-value">{inconclusive_pct:.1f}%</div>
+            {f'<div class="kpi-{"up" if inconclusive_change < 0 else "down"}">{"▼" if inconclusive_change < 0 else "▲"} {abs(inconclusive_change):.1f}%</div>' if prev_inconclusive_pct is not None else ''}
+            {f'<div class="kpi-compare">{comparison_label}: {prev_inconclusive_pct:.1f}%</div>' if prev_inconclusive_pct is not None else ''}
+        </div>
+        """, unsafe_allow_html=True)
+    
+    # Insurance Provider section with title
+    start_section('Insurance Providers')
+    st.markdown(f"""
+                <div class="numberOfPatients">
+                    <h3 class="sub">Total Patients: {total_patients:,.0f}</h3>
+                    <p>breakdown by Insurance Providers:</p>
+                </div>
+                """, unsafe_allow_html=True)
+
+    # Calculate Insurance Provider metrics
+    insurance_counts = cube_counts(cube_current, 'Insurance Provider')
+    
+    if cube_prev is not None:
+        prev_insurance_counts = cube_counts(cube_prev, 'Insurance Provider')
+    else:
+        prev_insurance_counts = None
+    
+    # Create columns for insurance metrics
+    ins_cols = st.columns(len(insurance_counts))
+    
+    # Display insurance provider metrics with comparison
+    for idx, (provider, count) in enumerate(insurance_counts.items()):
+        with ins_cols[idx]:
+            if cube_prev is not None and provider in prev_insurance_counts:
+                prev_count = prev_insurance_counts[provider]
+                if prev_count > 0:
+                    change_pct = ((count / prev_count) - 1) * 100
+                    st.markdown(f"""
+                    <div class="kpi-container">
+                        <div class="kpi-title">{provider}</div>
+                        <div class="kpi-value">{count:,.0f}</div>
+                        <div class="kpi-{"up" if change_pct > 0 else "down"}">{"▲" if change_pct > 0 else "▼"} {abs(change_pct):.1f}%</div>
+                        <div class="kpi-compare">{comparison_label}: {prev_count:,.0f}</div>
+                    </div>
+                    """, unsafe_allow_html=True)
+            else:
+                st.markdown(f"""
+                <div class="kpi-container">
+                    <div class="kpi-title">{provider}</div>
+                    <div class="kpi-value">{count:,.0f}</div>
+                </div>
+                """, unsafe_allow_html=True)
+
+    show_section_timings()
+
+except Exception as e:
+    st.error(f"Error loading data: {e}")
+    st.stop()
\ No newline at end of file
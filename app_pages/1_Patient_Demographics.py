@@ -2,20 +2,18 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from utils import initialize_page, load_data, create_sidebar, create_page_navigation, img_to_base64
+from utils import enter_page, start_section, start_figure, end_section, timed_chart, show_section_timings, load_data, aggregate_only, create_sidebar, create_page_navigation, load_prefix_sums, range_total, hierarchy_cubes, top_values, approximate_for, img_to_base64, dimension_breakdown, AGE_GROUPINGS, DEFAULT_AGE_GROUPING, bin_labels, parse_bounds
 
-# Initialize page
-initialize_page()
 
 try:
-    # Load data
-    df = load_data()
-    
-    # Create sidebar
-    current_start, current_end, prev_start, prev_end, comparison_label, prev_custom_start, filtered_df = create_sidebar(df)
+    # Load data (in streaming mode only the aggregates exist, df is None)
+    df = None if aggregate_only() else load_data()
     
     # Set current page for navigation
-    st.session_state['current_page'] = 'Patient Demographics'
+    enter_page('Patient Demographics')
+    
+    # Create sidebar
+    current_start, current_end, prev_start, prev_end, comparison_label, prev_custom_start, selected_hospitals = create_sidebar(df)
     
     st.markdown("""<style>
                 [data-testid="stHorizontalBlock"] {
@@ -28,18 +26,11 @@ try:
     
     # Create navigation
     create_page_navigation()
-    
-    # Filter data for current period
-    df_current = filtered_df[(filtered_df['Date of Admission'] >= current_start) & 
-                            (filtered_df['Date of Admission'] <= current_end)]
-    
-    # Filter data for previous period
-    if prev_start is not None and prev_end is not None:
-        df_prev = filtered_df[(filtered_df['Date of Admission'] >= prev_start) & 
-                             (filtered_df['Date of Admission'] <= prev_end)]
-    else:
-        df_prev = None
 
+    # In approximate mode the breakdowns are estimated from the sample; in
+    # streaming mode they are summed from the streamed breakdown cubes
+    approximate = approximate_for(df, current_start, current_end, selected_hospitals)
+    
     # Get period label for column title (PM, PQ, PY)
     if comparison_label == "":
         period_label = "(no comparison)"
@@ -47,6 +38,7 @@ try:
         period_label = comparison_label.replace("vs ", "")
 
     # ------ Key Insights ------
+    start_section('Section 0: Key Insights')
     
     # st.markdown("""<h3 class="sub">Key Insights</h3>""", unsafe_allow_html=True)
     image_path = 'assets/images/Insights.png'
@@ -60,40 +52,91 @@ try:
     """, unsafe_allow_html=True)
     
 
-    # Create age bins
-    age_bins = [0, 10, 20, 30, 40, 50, 60, 70, 80, 150]
-    age_labels = ['0-9', '10-19', '20-29', '30-39', '40-49', '50-59', '60-69', '70-79', '80+']
-    
-    df_current['Age (bins)'] = pd.cut(df_current['Age'], bins=age_bins, labels=age_labels, right=False)
-    if df_prev is not None:
-        df_prev['Age (bins)'] = pd.cut(df_prev['Age'], bins=age_bins, labels=age_labels, right=False)
-    
+    # Age groups: a preset or the analyst's own lower bounds, picked in the
+    # Age section below (session state holds the choice until then)
+    if 'age_grouping' not in st.session_state:
+        st.session_state.age_grouping = DEFAULT_AGE_GROUPING
+    if 'age_custom_bounds' not in st.session_state:
+        st.session_state.age_custom_bounds = '0, 18, 40, 65'
+
+    if st.session_state.age_grouping == 'Custom':
+        age_bounds = parse_bounds(st.session_state.age_custom_bounds)
+    else:
+        age_bounds = AGE_GROUPINGS.get(st.session_state.age_grouping)
+    age_bounds_valid = age_bounds is not None
+    age_bounds = age_bounds or AGE_GROUPINGS[DEFAULT_AGE_GROUPING]
+    age_labels = bin_labels(age_bounds)
+
+    # Patients, average stay and previous-period patients per value of each
+    # dimension, each from one grouped pass over both periods. They feed the
+    # insights, the charts and the tables below.
+    breakdown_filter = (current_start, current_end, prev_start, prev_end, selected_hospitals)
+    gender_breakdown = dimension_breakdown(df, 'Gender', *breakdown_filter, sampled=approximate)
+    age_breakdown = dimension_breakdown(df, 'Age', *breakdown_filter, bins=age_bounds, sampled=approximate)
+    blood_breakdown = dimension_breakdown(df, 'Blood Type', *breakdown_filter, sampled=approximate)
+    condition_breakdown = dimension_breakdown(df, 'Medical Condition', *breakdown_filter, sampled=approximate)
+    total_patients = range_total(load_prefix_sums(df), current_start, current_end, selected_hospitals)['Patient_Count']
+
     # 1. Age Distribution
-    age_group_counts = df_current['Age (bins)'].value_counts()
-    top_age_group = age_group_counts.idxmax()
-    top_age_percentage = (age_group_counts.max() / len(df_current)) * 100
+    top_age = age_breakdown.loc[age_breakdown['Patients_current'].idxmax()]
+    top_age_group = top_age['Age (bins)']
+    top_age_percentage = (top_age['Patients_current'] / total_patients) * 100
 
 
     # 2. Gender Disparity in Admissions
-    gender_counts = df_current['Gender'].value_counts()
-    total_patients = len(df_current)
-    female_count = gender_counts.get('Female', 0)
-    male_count = gender_counts.get('Male', 0)
+    genders = gender_breakdown.set_index('Gender')
+    female_count = genders['Patients_current'].get('Female', 0)
+    male_count = genders['Patients_current'].get('Male', 0)
     female_percentage = (female_count / total_patients) * 100
     male_percentage = (male_count / total_patients) * 100
-    female_avg_los = df_current[df_current['Gender'] == 'Female']['Length of Stay'].mean()
-    male_avg_los = df_current[df_current['Gender'] == 'Male']['Length of Stay'].mean()
+    female_avg_los = genders['Avg_Stay_current'].get('Female', float('nan'))
+    male_avg_los = genders['Avg_Stay_current'].get('Male', float('nan'))
 
     # 3. Prevalent Blood Type
-    blood_type_counts = df_current['Blood Type'].value_counts()
-    most_common_blood_type = blood_type_counts.idxmax()
-    blood_type_percentage = (blood_type_counts.max() / total_patients) * 100
-    blood_type_avg_los = df_current[df_current['Blood Type'] == most_common_blood_type]['Length of Stay'].mean()
+    top_blood_type = blood_breakdown.loc[blood_breakdown['Patients_current'].idxmax()]
+    most_common_blood_type = top_blood_type['Blood Type']
+    blood_type_percentage = (top_blood_type['Patients_current'] / total_patients) * 100
+    blood_type_avg_los = top_blood_type['Avg_Stay_current']
 
     # 4. Age and Hospital Stay
-    age_group_los = df_current.groupby('Age (bins)')['Length of Stay'].mean()
-    longest_los_age_group = age_group_los.idxmax()
-    longest_los = age_group_los.max()
+    longest_stay = age_breakdown.loc[age_breakdown['Avg_Stay_current'].idxmax()]
+    longest_los_age_group = longest_stay['Age (bins)']
+    longest_los = longest_stay['Avg_Stay_current']
+
+    def breakdown_metrics(breakdown, column, label):
+        # Table rows of a breakdown: average stay, previous-period patients
+        # and the change, which is 0 without previous patients. Estimates
+        # carry their confidence interval.
+        metrics = []
+        for values in breakdown.to_dict('records'):
+            prev_count = 0 if pd.isna(values['Patients_prev']) else int(values['Patients_prev'])
+            avg_stay_text = f"{values['Avg_Stay_current']:.2f}"
+            prev_count_text = f"{prev_count:,}"
+            if approximate:
+                avg_stay_text += f" ± {values['Avg_Stay_ci_current']:.2f}"
+                if prev_count:
+                    prev_count_text += f" ± {values['Patients_ci_prev']:,.0f}"
+            change_pct = 0 if pd.isna(values['Patients_change_pct']) else values['Patients_change_pct']
+
+            # Format the change percentage with arrow (with color)
+            if change_pct > 0:
+                change_text = f"▲{abs(change_pct):.1f}%"
+                change_color = "green"
+            elif change_pct < 0:
+                change_text = f"▼{abs(change_pct):.1f}%"
+                change_color = "red"
+            else:
+                change_text = "0.0%"
+                change_color = "gray"
+
+            metrics.append({
+                label: values[column],
+                'Avg Stay (days)': avg_stay_text,
+                f'Patients {period_label}': prev_count_text,
+                '% Change': change_text,
+                'color': change_color
+            })
+        return pd.DataFrame(metrics)
 
     # ------------------------------------------------------------
     # <---       Section 0: Key Insights        --->
@@ -124,16 +167,18 @@ try:
     # ------------------------------------------------------------
     # <---       Section 1: Gender        --->
     # ------------------------------------------------------------
+    start_section('Section 1: Gender')
     st.markdown("""<h3 class="sub">Gender</h3>""", unsafe_allow_html=True)
     
     col1, col2 = st.columns([1, 1.2], gap="large")
     
     with col1:
         # Gender distribution with Plotly
-        gender_counts = df_current['Gender'].value_counts().reset_index()
+        gender_counts = gender_breakdown[['Gender', 'Patients_current']]
         gender_counts.columns = ['Gender', 'Patients']
-        gender_counts = gender_counts.sort_values('Patients', ascending=True)
+        gender_counts = gender_counts.sort_values('Patients', ascending=True, kind='stable')
 
+        start_figure()
         fig_gender = px.bar(
             gender_counts, 
             y='Gender', 
@@ -151,46 +196,13 @@ try:
             height=300
         )
         # Display chart without buttons
-        st.plotly_chart(fig_gender, use_container_width=True)
+        timed_chart(fig_gender, use_container_width=True)
     
     with col2:
         # Create gender metrics table with Plotly
-        gender_metrics = []
-        
-        for gender in df_current['Gender'].unique():
-            gender_data = df_current[df_current['Gender'] == gender]
-            avg_los = gender_data['Length of Stay'].mean()
-            current_count = len(gender_data)
-            
-            if df_prev is not None:
-                prev_gender_data = df_prev[df_prev['Gender'] == gender]
-                prev_count = len(prev_gender_data)
-                change_pct = ((current_count / prev_count) - 1) * 100 if prev_count > 0 else 0
-            else:
-                prev_count = change_pct = 0
-            
-            # Format the change percentage with arrow (with color)
-            if change_pct > 0:
-                change_text = f"▲{abs(change_pct):.1f}%"
-                change_color = "green"
-            elif change_pct < 0:
-                change_text = f"▼{abs(change_pct):.1f}%"
-                change_color = "red"
-            else:
-                change_text = "0.0%"
-                change_color = "gray"
-            
-            gender_metrics.append({
-                'Gender': gender,
-                'Avg Stay (days)': f"{avg_los:.2f}",
-                f'Patients {period_label}': f"{prev_count:,}",
-                '% Change': change_text,
-                'color': change_color
-            })
-        
-        # Create plotly table
-        gender_df = pd.DataFrame(gender_metrics)
+        gender_df = breakdown_metrics(gender_breakdown, 'Gender', 'Gender')
         
+        start_figure()
         fig = go.Figure(data=[go.Table(
             header=dict(
                 values=list(gender_df.columns[:-1]),  # Exclude the color column
@@ -220,26 +232,34 @@ try:
         )
 
         # Add scrolling configuration
-        st.plotly_chart(fig, use_container_width=True )
+        timed_chart(fig, use_container_width=True )
     
     # ------------------------------------------------------------
     # <---       Section 2: Age        --->
     # ------------------------------------------------------------
+    start_section('Section 2: Age')
 
     st.markdown("""<h3 class="sub">Age</h3>""", unsafe_allow_html=True)
+
+    # Regrouping only rebins the per-age breakdown, not the patient rows
+    st.radio("Age groups:", list(AGE_GROUPINGS) + ['Custom'], key='age_grouping', horizontal=True)
+    if st.session_state.age_grouping == 'Custom':
+        st.text_input("Lower bound of each age group, comma-separated:", key='age_custom_bounds')
+        if not age_bounds_valid:
+            st.warning("Enter whole numbers of 0 or more, such as 0, 18, 65. Showing 10-year bands instead.")
     
     col1, col2 = st.columns([1, 1.2], gap="large")
     
     
     with col1:
         # Age distribution with Plotly
-        age_counts = df_current['Age (bins)'].value_counts().reset_index()
+        # Every age group gets a bar, also those without patients
+        age_counts = age_breakdown.set_index('Age (bins)')['Patients_current'].reindex(
+            pd.CategoricalIndex(age_labels, categories=age_labels, ordered=True, name='Age (bins)'), fill_value=0
+        ).reset_index()
         age_counts.columns = ['Age (bins)', 'Patients']
         
-        # Sort by age group
-        age_counts['Age (bins)'] = pd.Categorical(age_counts['Age (bins)'], categories=age_labels, ordered=True)
-        age_counts = age_counts.sort_values('Age (bins)')
-        
+        start_figure()
         fig_age = px.bar(
             age_counts, 
             y='Age (bins)', 
@@ -260,47 +280,13 @@ try:
             textangle=0,     # 0 = horizontal, 90 = vertical
         )
         
-        st.plotly_chart(fig_age, use_container_width=True )
+        timed_chart(fig_age, use_container_width=True )
     
     with col2:
         # Create age metrics table with Plotly
-        age_metrics = []
-        
-        for age_bin in age_labels:
-            age_data = df_current[df_current['Age (bins)'] == age_bin]
-            if len(age_data) > 0:
-                avg_los = age_data['Length of Stay'].mean()
-                current_count = len(age_data)
-                
-                if df_prev is not None:
-                    prev_age_data = df_prev[df_prev['Age (bins)'] == age_bin]
-                    prev_count = len(prev_age_data)
-                    change_pct = ((current_count / prev_count) - 1) * 100 if prev_count > 0 else 0
-                else:
-                    prev_count = change_pct = 0
-                
-                # Format the change percentage with arrow (with color)
-                if change_pct > 0:
-                    change_text = f"▲{abs(change_pct):.1f}%"
-                    change_color = "green"
-                elif change_pct < 0:
-                    change_text = f"▼{abs(change_pct):.1f}%"
-                    change_color = "red"
-                else:
-                    change_text = "0.0%"
-                    change_color = "gray"
-                
-                age_metrics.append({
-                    'Age': age_bin,
-                    'Avg Stay (days)': f"{avg_los:.2f}",
-                    f'Patients {period_label}': f"{prev_count:,}",
-                    '% Change': change_text,
-                    'color': change_color
-                })
-        
-        # Create plotly table
-        age_df = pd.DataFrame(age_metrics)
+        age_df = breakdown_metrics(age_breakdown, 'Age (bins)', 'Age')
         
+        start_figure()
         fig = go.Figure(data=[go.Table(
             header=dict(
                 values=list(age_df.columns[:-1]),  # Exclude the color column
@@ -330,11 +316,12 @@ try:
         )
 
         # Add scrolling configuration
-        st.plotly_chart(fig, use_container_width=True)
+        timed_chart(fig, use_container_width=True)
     
     # ------------------------------------------------------------
     # <---       Section 3: Blood Type        --->
     # ------------------------------------------------------------
+    start_section('Section 3: Blood Type')
 
     st.markdown("""<h3 class="sub">Blood Type</h3>""", unsafe_allow_html=True)
     
@@ -342,9 +329,10 @@ try:
     
     with col1:
         # Blood Type distribution with Plotly
-        blood_counts = df_current['Blood Type'].value_counts().reset_index()
+        blood_counts = blood_breakdown[['Blood Type', 'Patients_current']]
         blood_counts.columns = ['Blood Type', 'Patients']
-        blood_counts = blood_counts.sort_values('Patients', ascending=True)
+        blood_counts = blood_counts.sort_values('Patients', ascending=True, kind='stable')
+        start_figure()
         fig_blood = px.bar(
             blood_counts, 
             y='Blood Type', 
@@ -362,46 +350,13 @@ try:
             height=300
         )
         
-        st.plotly_chart(fig_blood, use_container_width=True, config={"displayModeBar": False})
+        timed_chart(fig_blood, use_container_width=True, config={"displayModeBar": False})
     
     with col2:
         # Create blood type metrics table with Plotly
-        blood_metrics = []
-        
-        for blood_type in df_current['Blood Type'].unique():
-            blood_data = df_current[df_current['Blood Type'] == blood_type]
-            avg_los = blood_data['Length of Stay'].mean()
-            current_count = len(blood_data)
-            
-            if df_prev is not None:
-                prev_blood_data = df_prev[df_prev['Blood Type'] == blood_type]
-                prev_count = len(prev_blood_data)
-                change_pct = ((current_count / prev_count) - 1) * 100 if prev_count > 0 else 0
-            else:
-                prev_count = change_pct = 0
-            
-            # Format the change percentage with arrow (with color)
-            if change_pct > 0:
-                change_text = f"▲{abs(change_pct):.1f}%"
-                change_color = "green"
-            elif change_pct < 0:
-                change_text = f"▼{abs(change_pct):.1f}%"
-                change_color = "red"
-            else:
-                change_text = "0.0%"
-                change_color = "gray"
-            
-            blood_metrics.append({
-                'Blood Type': blood_type,
-                'Avg Stay (days)': f"{avg_los:.2f}",
-                f'Patients {period_label}': f"{prev_count:,}",
-                '% Change': change_text,
-                'color': change_color
-            })
-        
-        # Create plotly table
-        blood_df = pd.DataFrame(blood_metrics)
+        blood_df = breakdown_metrics(blood_breakdown, 'Blood Type', 'Blood Type')
         
+        start_figure()
         fig = go.Figure(data=[go.Table(
             header=dict(
                 values=list(blood_df.columns[:-1]),  # Exclude the color column
@@ -431,21 +386,35 @@ try:
         )
 
         # Add scrolling configuration
-        st.plotly_chart(fig, use_container_width=True)
+        timed_chart(fig, use_container_width=True)
     
     # ------------------------------------------------------------
     # <---       Section 4: Medical Condition        --->
     # ------------------------------------------------------------
+    start_section('Section 4: Medical Condition')
     st.markdown("""<h3 class="sub">Medical Condition</h3>""", unsafe_allow_html=True)
     
     col1, col2 = st.columns([1, 1.2], gap="large")
     
+    # The ten conditions with the most patients, picked from the condition
+    # summaries instead of sorting every condition's count. The streamed
+    # breakdown already holds every condition's exact count.
+    if df is None:
+        top_condition_names = condition_breakdown.sort_values(
+            'Patients_current', ascending=False, kind='stable'
+        )['Medical Condition'].head(10)
+    else:
+        top_condition_names = top_values(df, 'Medical Condition', current_start, current_end, selected_hospitals, 10)['Medical Condition']
+    top_conditions = condition_breakdown.set_index('Medical Condition')
+    top_conditions = top_conditions.loc[[name for name in top_condition_names if name in top_conditions.index]].reset_index()
+
     with col1:
         # Medical Condition distribution with Plotly (top 10)
-        condition_counts = df_current['Medical Condition'].value_counts().head(10).reset_index()
+        condition_counts = top_conditions[['Medical Condition', 'Patients_current']]
         condition_counts.columns = ['Medical Condition', 'Patients']
-        condition_counts = condition_counts.sort_values('Patients', ascending=True)
+        condition_counts = condition_counts.sort_values('Patients', ascending=True, kind='stable')
 
+        start_figure()
         fig_condition = px.bar(
             condition_counts, 
             y='Medical Condition', 
@@ -463,47 +432,13 @@ try:
             height=300
         )
         
-        st.plotly_chart(fig_condition, use_container_width=True)
+        timed_chart(fig_condition, use_container_width=True)
     
     with col2:
         # Create medical condition metrics table with Plotly (top 10)
-        top_conditions = df_current['Medical Condition'].value_counts().head(10).index.tolist()
-        condition_metrics = []
-        
-        for condition in top_conditions:
-            condition_data = df_current[df_current['Medical Condition'] == condition]
-            avg_los = condition_data['Length of Stay'].mean()
-            current_count = len(condition_data)
-            
-            if df_prev is not None:
-                prev_condition_data = df_prev[df_prev['Medical Condition'] == condition]
-                prev_count = len(prev_condition_data)
-                change_pct = ((current_count / prev_count) - 1) * 100 if prev_count > 0 else 0
-            else:
-                prev_count = change_pct = 0
-            
-            # Format the change percentage with arrow (with color)
-            if change_pct > 0:
-                change_text = f"▲{abs(change_pct):.1f}%"
-                change_color = "green"
-            elif change_pct < 0:
-                change_text = f"▼{abs(change_pct):.1f}%"
-                change_color = "red"
-            else:
-                change_text = "0.0%"
-                change_color = "gray"
-            
-            condition_metrics.append({
-                'Medical Condition': condition,
-                'Avg Stay (days)': f"{avg_los:.2f}",
-                f"Patients {period_label}": f"{prev_count:,}",
-                '% Change': change_text,
-                'color': change_color
-            })
-        
-        # Create plotly table
-        condition_df = pd.DataFrame(condition_metrics)
+        condition_df = breakdown_metrics(top_conditions, 'Medical Condition', 'Medical Condition')
         
+        start_figure()
         fig = go.Figure(data=[go.Table(
             header=dict(
                 values=list(condition_df.columns[:-1]),  # Exclude the color column
@@ -532,7 +467,7 @@ try:
             height=300
         )
 
-        st.plotly_chart(fig, use_container_width=True)
+        timed_chart(fig, use_container_width=True)
 
 
     # ------------------------------------------------------------
@@ -549,6 +484,14 @@ try:
             </div>
     """, unsafe_allow_html=True)
 
+    # The hierarchies cross up to three dimensions of the patient rows,
+    # which streaming mode does not keep
+    if df is None:
+        st.info("The hierarchy chart needs patient-level data, which is not loaded in streaming mode. "
+                "Set HEALTHCARE_LOAD_MODE=memory to view it.")
+        show_section_timings()
+        st.stop()
+
     # Define the hierarchy options
     hierarchy_options = [
         'Medical Condition → Gender → Age (bins)',
@@ -566,121 +509,132 @@ try:
         ['Age (bins)', 'Insurance Provider', 'Admission Type']
     ]
 
-    
-    # --- Column Layout ---
-    col1, col2 = st.columns([1.5, 1], gap="large")
+    # Patients and billing per node of every path, built together once per
+    # filter and age grouping; the fragment below only looks its path up
+    sunburst_cubes = hierarchy_cubes(df, hierarchy_options_2, current_start, current_end, selected_hospitals, age_bounds)
 
-    with col1:
-        # Use session state to remember the selection, default to 'Medical Condition'
-        if 'sunburst_inner_ring' not in st.session_state:
-            st.session_state.sunburst_inner_ring = 'Medical Condition → Gender → Age (bins)'
-        
-        if 'sunburst_agg' not in st.session_state:
-            st.session_state.sunburst_agg = 'Number of Patients'
-        
-        # Get the selected inner ring from session state
-        selected_inner_ring = st.session_state.sunburst_inner_ring
-        selected_agg = st.session_state.sunburst_agg
-
-        if  selected_agg == 'Number of Patients':
-            selected_agg = 'Patients'
-        else:    
-            selected_agg = 'Billing'
-
-        index = 0
-        for i in range(len(hierarchy_options)):
-            if hierarchy_options[i] == selected_inner_ring:
-                index = i
-        
-        
-        st.markdown(f"""<h6 class='sub'>Patient Distribution Hierarchy (by {selected_inner_ring})</h6>""", unsafe_allow_html=True)
-        
-        # --- Dynamic Path Creation ---
-        # Define the default path structure, replacing the first element
-        path_structure = hierarchy_options_2[index]
-        
-        # --- Dynamic Data Grouping ---
-        # Ensure the selected column exists in the DataFrame
-        try:
-            # Group by the dynamic path structure
-            sunburst_data = df_current.groupby(path_structure).agg(
-                Patients = ('Patient ID', 'count'),
-                Billing = ('Billing Amount','sum')
-            ).reset_index()
+    
+    # The path and metric radios only redraw the sunburst, so this section
+    # reruns on its own as a fragment instead of rerunning the whole page
+    @st.fragment
+    def sunburst_section():
+        start_section('Section 5: Sunburst Chart')
+        # --- Column Layout ---
+        col1, col2 = st.columns([1.5, 1], gap="large")
+
+        with col1:
+            # Use session state to remember the selection, default to 'Medical Condition'
+            if 'sunburst_inner_ring' not in st.session_state:
+                st.session_state.sunburst_inner_ring = 'Medical Condition → Gender → Age (bins)'
+        
+            if 'sunburst_agg' not in st.session_state:
+                st.session_state.sunburst_agg = 'Number of Patients'
+        
+            # Get the selected inner ring from session state
+            selected_inner_ring = st.session_state.sunburst_inner_ring
+            selected_agg = st.session_state.sunburst_agg
+
+            if  selected_agg == 'Number of Patients':
+                selected_agg = 'Patients'
+            else:    
+                selected_agg = 'Billing'
+
+            index = 0
+            for i in range(len(hierarchy_options)):
+                if hierarchy_options[i] == selected_inner_ring:
+                    index = i
+        
+        
+            st.markdown(f"""<h6 class='sub'>Patient Distribution Hierarchy (by {selected_inner_ring})</h6>""", unsafe_allow_html=True)
+        
+            # --- Dynamic Path Creation ---
+            # Define the default path structure, replacing the first element
+            path_structure = hierarchy_options_2[index]
+        
+            # --- Dynamic Data Grouping ---
+            # Ensure the selected column exists in the DataFrame
+            try:
+                # The path's cube, already grouped with both metrics
+                sunburst_data = sunburst_cubes[tuple(path_structure)]
             
             
-            # --- Create the Sunburst Chart ---
-            fig_sunburst = px.sunburst(
-                sunburst_data,
-                path=path_structure, # Use the dynamic path
-                values= selected_agg,
-                color= selected_agg,
-                color_continuous_scale='Blues',
-                maxdepth=3,
-                branchvalues='total'
+                # --- Create the Sunburst Chart ---
+                start_figure()
+                fig_sunburst = px.sunburst(
+                    sunburst_data,
+                    path=path_structure, # Use the dynamic path
+                    values= selected_agg,
+                    color= selected_agg,
+                    color_continuous_scale='Blues',
+                    maxdepth=3,
+                    branchvalues='total'
+                )
+
+                # Update layout
+                fig_sunburst.update_layout(
+                    plot_bgcolor='rgba(0,0,0,0)',
+                    paper_bgcolor='rgba(0,0,0,0)',
+                    height=650,
+                    margin=dict(t=10, l=0, r=0, b=0) # Adjusted top margin
+                )
+
+                # Update hover template
+                fig_sunburst.update_traces(
+                    hovertemplate="""
+                    <b>%{label}</b><br>
+                    Value: %{value:,.0f}<br>
+                    Percentage: %{percentParent:.1%}<br>
+                    <extra></extra>
+                    """
+                )
+
+                timed_chart(fig_sunburst, use_container_width=True)
+        
+            except Exception as e:
+                st.error(f"Could not generate chart with {selected_inner_ring}. Error: {e}")
+        
+
+        with col2:
+            st.markdown("""
+            <h6 class='sub'>How to Read This Chart</h6>
+            <p style='margin-bottom: 10px;'>This interactive sunburst chart visualizes the hierarchical relationship, Compare relative sizes of patient segments and explore demographic patterns.</p>
+            <div style="margin-left: 30px; margin-bottom: 45px;">    
+                <p style='margin-bottom: 10px;'><b>Interactive Features:</b></p>
+                <ul style='margin-bottom: 15px; line-height:1.1;'>
+                    <li>Click on any segment to zoom in</li>
+                    <li>Click in the center to zoom out</li>
+                    <li>Hover over segments to see detailed information</li>
+                </ul>
+            </div>
+            """, unsafe_allow_html=True)
+
+            # --- Selectbox for Inner Ring ---
+            # Use a key to link the selectbox to session state
+            # The on_change will trigger a rerun, updating the chart
+
+            st.radio(
+                "Select a path:",
+                hierarchy_options,
+                key='sunburst_inner_ring', # Link to session state key
+                index=hierarchy_options.index(st.session_state.sunburst_inner_ring), 
+                horizontal=False 
             )
 
-            # Update layout
-            fig_sunburst.update_layout(
-                plot_bgcolor='rgba(0,0,0,0)',
-                paper_bgcolor='rgba(0,0,0,0)',
-                height=650,
-                margin=dict(t=10, l=0, r=0, b=0) # Adjusted top margin
-            )
+            st.markdown("""<div style="margin-top:25px"> </div>""", unsafe_allow_html=True) 
 
-            # Update hover template
-            fig_sunburst.update_traces(
-                hovertemplate="""
-                <b>%{label}</b><br>
-                Value: %{value:,.0f}<br>
-                Percentage: %{percentParent:.1%}<br>
-                <extra></extra>
-                """
+            st.radio(
+                "Select a metric:",
+                ['Number of Patients', 'Total Billing'],
+                key='sunburst_agg', # Link to session state key
+                index=0, 
+                horizontal=False 
             )
+        end_section()
 
-            st.plotly_chart(fig_sunburst, use_container_width=True)
-        
-        except Exception as e:
-            st.error(f"Could not generate chart with {selected_inner_ring}. Error: {e}")
-        
-
-    with col2:
-        st.markdown("""
-        <h6 class='sub'>How to Read This Chart</h6>
-        <p style='margin-bottom: 10px;'>This interactive sunburst chart visualizes the hierarchical relationship, Compare relative sizes of patient segments and explore demographic patterns.</p>
-        <div style="margin-left: 30px; margin-bottom: 45px;">    
-            <p style='margin-bottom: 10px;'><b>Interactive Features:</b></p>
-            <ul style='margin-bottom: 15px; line-height:1.1;'>
-                <li>Click on any segment to zoom in</li>
-                <li>Click in the center to zoom out</li>
-                <li>Hover over segments to see detailed information</li>
-            </ul>
-        </div>
-        """, unsafe_allow_html=True)
-
-        # --- Selectbox for Inner Ring ---
-        # Use a key to link the selectbox to session state
-        # The on_change will trigger a rerun, updating the chart
-
-        st.radio(
-            "Select a path:",
-            hierarchy_options,
-            key='sunburst_inner_ring', # Link to session state key
-            index=hierarchy_options.index(st.session_state.sunburst_inner_ring), 
-            horizontal=False 
-        )
+    sunburst_section()
+    show_section_timings()
 
-        st.markdown("""<div style="margin-top:25px"> </div>""", unsafe_allow_html=True) 
 
-        st.radio(
-            "Select a metric:",
-            ['Number of Patients', 'Total Billing'],
-            key='sunburst_agg', # Link to session state key
-            index=0, 
-            horizontal=False 
-        )
-  
-        
 except Exception as e:
     st.error(f"Error loading data: {e}")
     st.stop()
\ No newline at end of file
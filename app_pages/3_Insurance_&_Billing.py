@@ -3,21 +3,19 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from utils import initialize_page, load_data, load_clusters, create_sidebar, create_page_navigation, img_to_base64
+from utils import enter_page, start_section, load_prefix_sums, range_total, start_figure, timed_chart, show_section_timings, load_data, aggregate_only, compare_periods, load_daily_cube, load_breakdown_cube, load_catalog, load_cluster_labels, billing_edges, billing_histogram, compare_periods_sampled, sample_histogram, approximate_for, create_sidebar, slice_periods, create_page_navigation, img_to_base64
 
 
 
-# Initialize page
-initialize_page()
 
 try:
-    # Load data
-    df = load_data()
-
-    current_start, current_end, prev_start, prev_end, comparison_label, prev_custom_start, filtered_df = create_sidebar(df)
+    # Load data (in streaming mode only the aggregates exist, df is None)
+    df = None if aggregate_only() else load_data()
     
     # Set current page for navigation
-    st.session_state['current_page'] = 'Insurance & Billing'
+    enter_page('Insurance & Billing')
+
+    current_start, current_end, prev_start, prev_end, comparison_label, prev_custom_start, selected_hospitals = create_sidebar(df)
     
     st.markdown("""<style>
                 [data-testid="stHorizontalBlock"] {
@@ -53,16 +51,16 @@ try:
     # Create navigation
     create_page_navigation()
 
-    # Filter data for current period
-    df_current = filtered_df[(filtered_df['Date of Admission'] >= current_start) & 
-                            (filtered_df['Date of Admission'] <= current_end)]
-    
-    # Filter data for previous period
-    if prev_start is not None and prev_end is not None:
-        df_prev = filtered_df[(filtered_df['Date of Admission'] >= prev_start) & 
-                             (filtered_df['Date of Admission'] <= prev_end)]
-    else:
-        df_prev = None
+    # Slice the current period out of the date-sorted data for the
+    # row-level charts. Streaming mode has no rows: the totals, histogram
+    # and breakdowns come from the streamed cubes instead.
+    if df is not None:
+        df_current, _ = slice_periods(df, current_start, current_end, None, None, selected_hospitals)
+    has_prev = prev_start is not None and prev_end is not None
+
+    # In approximate mode the histogram and the insurer breakdown are
+    # estimated from the sample
+    approximate = approximate_for(df, current_start, current_end, selected_hospitals)
 
     # Get period label for column title (PM, PQ, PY)
     if comparison_label == "":
@@ -73,19 +71,36 @@ try:
 
 
     # ------ Section 1: Overview ------
+    start_section('Section 1: Overview')
 
     st.markdown("""<h3 class="sub">Billing Overview</h3>""", unsafe_allow_html=True)
 
-    Total_Billing_Amount_current = df_current['Billing Amount'].sum()
-    Billing_Amount_Male_current = df_current[df_current['Gender']=='Male']['Billing Amount'].sum()
-    Billing_Amount_Female_current = df_current[df_current['Gender']=='Female']['Billing Amount'].sum()
+    # Billing totals per gender for both periods from one grouped pass (over
+    # the gender cube in streaming mode). The overall totals come from the
+    # daily prefix sums, so they include patients without a known gender.
+    billing_prefix = load_prefix_sums(df)
+    if df is None:
+        billing_source, billing_measure = load_breakdown_cube('Gender'), ('Total_Billing', 'sum')
+    else:
+        billing_source, billing_measure = df, ('Billing Amount', 'sum')
+    gender_billing = compare_periods(
+        billing_source, ['Gender'], current_start, current_end, prev_start, prev_end, selected_hospitals,
+        how='outer', Total_Billing=billing_measure
+    ).set_index('Gender').fillna(0)
+
+    gender_billing_current = gender_billing['Total_Billing_current']
+    Total_Billing_Amount_current = range_total(billing_prefix, current_start, current_end, selected_hospitals)['Total_Billing']
+    Billing_Amount_Male_current = gender_billing_current.get('Male', 0)
+    Billing_Amount_Female_current = gender_billing_current.get('Female', 0)
     
-    if df_prev is not None:
-        Total_Billing_Amount_prev= df_prev['Billing Amount'].sum()   
+    if has_prev:
+        gender_billing_prev = gender_billing['Total_Billing_prev']
+
+        Total_Billing_Amount_prev = range_total(billing_prefix, prev_start, prev_end, selected_hospitals)['Total_Billing']
         Total_Billing_Amount_Difference = ( ( Total_Billing_Amount_current / Total_Billing_Amount_prev ) - 1 ) * 100  
-        Billing_Amount_Male_prev = df_prev[df_prev['Gender']=='Male']['Billing Amount'].sum()
+        Billing_Amount_Male_prev = gender_billing_prev.get('Male', 0)
         Billing_Amount_Male_Difference = ( ( Billing_Amount_Male_current / Billing_Amount_Male_prev ) - 1 ) * 100
-        Billing_Amount_Female_prev = df_prev[df_prev['Gender']=='Female']['Billing Amount'].sum()
+        Billing_Amount_Female_prev = gender_billing_prev.get('Female', 0)
         Billing_Amount_Female_Difference = ( ( Billing_Amount_Female_current / Billing_Amount_Female_prev ) - 1 ) * 100
     else:
         Total_Billing_Amount_prev = None
@@ -138,10 +153,16 @@ try:
         st.markdown("<h6 style='text-align: left;'>Billing Amount Distribution</h6>", unsafe_allow_html=True)
 
 
-        # Create histogram data with fixed number of bins
-        hist_data = np.histogram(df_current['Billing Amount'], bins=12)
-        bin_counts = hist_data[0]
-        bin_edges = hist_data[1] / 1000
+        # Create histogram data with fixed bins over the whole dataset's
+        # billing range, so they stay put when the filters or the mode change
+        edges = billing_edges(load_catalog(df))
+        if approximate:
+            bin_counts, bin_intervals = sample_histogram(
+                df, 'Billing Amount', current_start, current_end, selected_hospitals, edges
+            )
+        else:
+            bin_counts = billing_histogram(df, current_start, current_end, selected_hospitals, edges)
+        bin_edges = edges / 1000
         
         # Find the bin with the highest count
         max_count_idx = np.argmax(bin_counts)
@@ -154,6 +175,7 @@ try:
         bin_labels = [f"${bin_edges[i]:,.1f}K - ${bin_edges[i+1]:,.1f}K" for i in range(len(bin_edges)-1)]
         
         # Create the histogram with custom colors
+        start_figure()
         fig_hist = go.Figure()
         
         # Add bars one by one to control colors
@@ -164,6 +186,7 @@ try:
                 marker_color=colors[i],
                 text=[bin_counts[i]],
                 textposition='inside',
+                error_y=dict(type='data', array=[bin_intervals[i]]) if approximate else None,
                 width=0.85,  # Width of bars (adjust as needed)
                 name='Most common' if i == max_count_idx else 'Regular'
             ))
@@ -211,10 +234,11 @@ try:
             hovertemplate="Range: %{x}<br>Patients: %{y}<extra></extra>"
         )
 
-        st.plotly_chart(fig_hist, use_container_width=True)
+        timed_chart(fig_hist, use_container_width=True)
 
 
     # ------ Section 2: Insurance Provider Analysis ------
+    start_section('Section 2: Insurance Provider Analysis')
 
     st.markdown("""
                 <div class="numberOfPatients">
@@ -224,36 +248,52 @@ try:
                 """, unsafe_allow_html=True
     )
 
-    # Calculate metrics per hospital for current and previous periods
-    insurance_metrics_current = df_current.groupby('Insurance Provider').agg({
-        'Patient ID': 'count',
-        'Billing Amount': 'mean'
-    }).reset_index()
-    insurance_metrics_current.columns = ['Insurance Provider', 'Patient_Count', 'Avg_Billing']
-
-    if df_prev is not None:
-        insurance_metrics_prev = df_prev.groupby('Insurance Provider').agg({
-            'Patient ID': 'count',
-            'Billing Amount': 'mean'
-        }).reset_index()
-        insurance_metrics_prev.columns = ['Insurance Provider', 'Patient_Count', 'Avg_Billing']
-        
-        # Merge to get both periods in one dataframe
-        insurance_metrics = pd.merge(
-            insurance_metrics_current, 
-            insurance_metrics_prev,
-            on='Insurance Provider', 
-            suffixes=('_current', '_prev')
+    # Calculate metrics per insurer for both periods in one grouped pass
+    if approximate:
+        insurance_comparison = compare_periods_sampled(
+            df, ['Insurance Provider'], 'Billing Amount', 'Avg_Billing', current_start, current_end,
+            prev_start, prev_end, selected_hospitals
         )
-        
-        # Calculate percent changes
-        insurance_metrics['Patient_Change_Pct'] = ((insurance_metrics['Patient_Count_current'] / insurance_metrics['Patient_Count_prev']) - 1) * 100
-        insurance_metrics['Billing_Change_Pct'] = ((insurance_metrics['Avg_Billing_current'] / insurance_metrics['Avg_Billing_prev']) - 1) * 100
+        insurance_comparison.columns = insurance_comparison.columns.str.replace('Patients_', 'Patient_Count_')
+    elif df is None:
+        # Patients and billing per insurer are cube measures
+        insurance_comparison = compare_periods(
+            load_daily_cube(df), ['Insurance Provider'], current_start, current_end, prev_start, prev_end,
+            selected_hospitals, ratios={'Avg_Billing': ('Total_Billing', 'Billing_Count')},
+            Patient_Count=('Patient_Count', 'sum'), Total_Billing=('Total_Billing', 'sum'),
+            Billing_Count=('Billing_Count', 'sum')
+        )
+    else:
+        insurance_comparison = compare_periods(
+            df, ['Insurance Provider'], current_start, current_end, prev_start, prev_end, selected_hospitals,
+            Patient_Count=('Patient ID', 'count'), Avg_Billing=('Billing Amount', 'mean')
+        )
+
+    if has_prev:
+        insurance_metrics = pd.DataFrame({
+            'Insurance Provider': insurance_comparison['Insurance Provider'],
+            'Patient_Count_current': insurance_comparison['Patient_Count_current'],
+            'Avg_Billing_current': insurance_comparison['Avg_Billing_current'],
+            'Patient_Count_prev': insurance_comparison['Patient_Count_prev'],
+            'Avg_Billing_prev': insurance_comparison['Avg_Billing_prev'],
+            'Patient_Change_Pct': insurance_comparison['Patient_Count_change_pct'],
+            'Billing_Change_Pct': insurance_comparison['Avg_Billing_change_pct']
+        })
+        if approximate:
+            insurance_metrics['Patient_Count_ci'] = insurance_comparison['Patient_Count_ci_current']
+            insurance_metrics['Avg_Billing_ci'] = insurance_comparison['Avg_Billing_ci_current']
         
         # Sort by current patient count
         insurance_metrics = insurance_metrics.sort_values('Patient_Count_current', ascending= True)
     else:
-        insurance_metrics = insurance_metrics_current
+        insurance_metrics = pd.DataFrame({
+            'Insurance Provider': insurance_comparison['Insurance Provider'],
+            'Patient_Count': insurance_comparison['Patient_Count_current'],
+            'Avg_Billing': insurance_comparison['Avg_Billing_current']
+        })
+        if approximate:
+            insurance_metrics['Patient_Count_ci'] = insurance_comparison['Patient_Count_ci_current']
+            insurance_metrics['Avg_Billing_ci'] = insurance_comparison['Avg_Billing_ci_current']
         insurance_metrics = insurance_metrics.sort_values('Patient_Count', ascending=True)
 
     # Get the order of hospitals
@@ -265,14 +305,16 @@ try:
     with col1:
         st.markdown("<h6 style='text-align: left;'>Patient Volume by Insurance Provider</h6>", unsafe_allow_html=True)
         
-        if df_prev is not None:
+        if has_prev:
             # Create horizontal bar chart with target lines
+            start_figure()
             fig = go.Figure()
             
             # Add bars for current period
             fig.add_trace(go.Bar(
                 y=insurance_metrics['Insurance Provider'],
                 x=insurance_metrics['Patient_Count_current'],
+                error_x=dict(type='data', array=insurance_metrics['Patient_Count_ci']) if approximate else None,
                 orientation='h',
                 name='Current Period',
                 marker_color='#2f88ff',
@@ -326,13 +368,15 @@ try:
                 legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
             )
             
-            st.plotly_chart(fig, use_container_width=True)
+            timed_chart(fig, use_container_width=True)
         else:
             # Simple bar chart for current period only
+            start_figure()
             fig = px.bar(
                 insurance_metrics,
                 y='Insurance Provider',
                 x='Patient_Count',
+                error_x='Patient_Count_ci' if approximate else None,
                 orientation='h',
                 text='Patient_Count',
                 color_discrete_sequence=['#2f88ff']
@@ -346,19 +390,21 @@ try:
                 height=370,
                 bargap=0.25
             )
-            st.plotly_chart(fig, use_container_width=True)
+            timed_chart(fig, use_container_width=True)
 
     with col2:
         st.markdown("<h6 style='text-align: left;'>Average Billing by Insurance Provider</h6>", unsafe_allow_html=True)
         
-        if df_prev is not None:
+        if has_prev:
             # Create horizontal bar chart with target lines
+            start_figure()
             fig = go.Figure()
             
             # Add bars for current period
             fig.add_trace(go.Bar(
                 y=insurance_metrics['Insurance Provider'],
                 x=insurance_metrics['Avg_Billing_current'],
+                error_x=dict(type='data', array=insurance_metrics['Avg_Billing_ci']) if approximate else None,
                 orientation='h',
                 name='Current Period',
                 marker_color='#2f88ff',
@@ -416,13 +462,15 @@ try:
                 tickformat=",",
             )
             
-            st.plotly_chart(fig, use_container_width=True)
+            timed_chart(fig, use_container_width=True)
         else:
             # Simple bar chart for current period only
+            start_figure()
             fig = px.bar(
                 insurance_metrics,
                 y='Insurance Provider',
                 x='Avg_Billing',
+                error_x='Avg_Billing_ci' if approximate else None,
                 orientation='h',
                 text=insurance_metrics['Avg_Billing'].apply(lambda x: f"${x:,.0f}"),
                 color_discrete_sequence=['#2f88ff']
@@ -440,42 +488,43 @@ try:
                 tickprefix="$",
                 tickformat=",",
             )
-            st.plotly_chart(fig, use_container_width=True)
+            timed_chart(fig, use_container_width=True)
 
 
     # ------------------------------------------------------------
     # <---       Section 3: Condition-Specific Billing        --->
     # ------------------------------------------------------------
+    start_section('Section 3: Condition-Specific Billing')
 
     st.markdown("""<h3 class="sub">Condition-Specific Billing</h3>""", unsafe_allow_html=True)
 
-    conditions_avg_billing_current = df_current.groupby('Medical Condition').agg({
-        'Billing Amount': 'mean'
-    }).reset_index()
-    conditions_avg_billing_current.columns = ['Medical Condition', 'Avg_Billing']
-
-    if df_prev is not None:
-
-        conditions_avg_billing_prev = df_prev.groupby('Medical Condition').agg({
-            'Billing Amount': 'mean'
-        }).reset_index()
-
-        conditions_avg_billing_prev.columns = ['Medical Condition', 'Avg_Billing']
-
-        # Merge to get both periods in one dataframe
-        conditions_avg_billing = pd.merge(
-            conditions_avg_billing_current, 
-            conditions_avg_billing_prev,
-            on='Medical Condition', 
-            suffixes=('_current', '_prev')
+    if df is None:
+        conditions_comparison = compare_periods(
+            load_breakdown_cube('Medical Condition'), ['Medical Condition'], current_start, current_end,
+            prev_start, prev_end, selected_hospitals, ratios={'Avg_Billing': ('Total_Billing', 'Billing_Count')},
+            Total_Billing=('Total_Billing', 'sum'), Billing_Count=('Billing_Count', 'sum')
+        )
+    else:
+        conditions_comparison = compare_periods(
+            df, ['Medical Condition'], current_start, current_end, prev_start, prev_end, selected_hospitals,
+            Avg_Billing=('Billing Amount', 'mean')
         )
 
-        conditions_avg_billing['Billing_Change_Pct'] = ((conditions_avg_billing['Avg_Billing_current'] / conditions_avg_billing['Avg_Billing_prev']) - 1) * 100
+    if has_prev:
+        conditions_avg_billing = pd.DataFrame({
+            'Medical Condition': conditions_comparison['Medical Condition'],
+            'Avg_Billing_current': conditions_comparison['Avg_Billing_current'],
+            'Avg_Billing_prev': conditions_comparison['Avg_Billing_prev'],
+            'Billing_Change_Pct': conditions_comparison['Avg_Billing_change_pct']
+        })
 
         # Sort by current patient count
         conditions_avg_billing = conditions_avg_billing.sort_values('Avg_Billing_current', ascending= True)
     else:
-        conditions_avg_billing = conditions_avg_billing_current
+        conditions_avg_billing = pd.DataFrame({
+            'Medical Condition': conditions_comparison['Medical Condition'],
+            'Avg_Billing': conditions_comparison['Avg_Billing_current']
+        })
         conditions_avg_billing = conditions_avg_billing.sort_values('Avg_Billing', ascending=True)
 
     col1, col2 = st.columns(2)
@@ -483,8 +532,9 @@ try:
     with col1:
         st.markdown("<h6 style='text-align: left;'>Average Billing Amount by Medical Condition</h6>", unsafe_allow_html=True)
         
-        if df_prev is not None:
+        if has_prev:
             # Create horizontal bar chart with target lines
+            start_figure()
             fig = go.Figure()
             
             # Add bars for current period
@@ -552,10 +602,11 @@ try:
                 tickformat=",",
             )
 
-            st.plotly_chart(fig, use_container_width=True)
+            timed_chart(fig, use_container_width=True)
 
         else:
             # Simple bar chart for current period only
+            start_figure()
             fig = px.bar(
                 conditions_avg_billing,
                 y='Medical Condition',
@@ -577,35 +628,42 @@ try:
                 tickprefix="$",
                 tickformat=",",
             )
-            st.plotly_chart(fig, use_container_width=True)
+            timed_chart(fig, use_container_width=True)
 
     with col2:
         st.markdown("<h6 style='text-align: left;'>Distribution of Billing Amount by Medical Condition</h6>", unsafe_allow_html=True)    
 
-        fig = px.box(df_current, x='Medical Condition', y='Billing Amount' )
-        fig.update_layout(
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            margin=dict(l=0, r=0, t=20, b=0),
-            yaxis=dict(
-                title="Billing Amount ($)",
-                range=[0, df_current['Billing Amount'].max() * 1.2]  # Increase max by 20%
-            ),
-            xaxis_title='Medical Condition',
-            bargap=0.25,
-            height=500
-        )
-        fig.update_yaxes(
-            gridcolor='rgba(211,211,211,0.3)'
-        )
+        # A box plot needs every patient's billing amount
+        if df is None:
+            st.info("The billing distribution per condition needs patient-level data, which is not loaded "
+                    "in streaming mode.")
+        else:
+            start_figure()
+            fig = px.box(df_current, x='Medical Condition', y='Billing Amount' )
+            fig.update_layout(
+                plot_bgcolor='rgba(0,0,0,0)',
+                paper_bgcolor='rgba(0,0,0,0)',
+                margin=dict(l=0, r=0, t=20, b=0),
+                yaxis=dict(
+                    title="Billing Amount ($)",
+                    range=[0, df_current['Billing Amount'].max() * 1.2]  # Increase max by 20%
+                ),
+                xaxis_title='Medical Condition',
+                bargap=0.25,
+                height=500
+            )
+            fig.update_yaxes(
+                gridcolor='rgba(211,211,211,0.3)'
+            )
         
     
-        st.plotly_chart(fig, use_container_width=True)
+            timed_chart(fig, use_container_width=True)
 
 
     # ------------------------------------------------------------
     # <---       Section 4: Patient Risk & Billing Clustering Model        --->
     # ------------------------------------------------------------
+    start_section('Section 4: Patient Risk & Billing Clustering Model')
     image_path = 'assets/images/machine-learning.png'
     st.markdown(f"""
             <div style="display: flex; flex-direction: row; align-items: center; margin-bottom: 10px; margin-top: 30px; gap: 15px;">
@@ -614,9 +672,24 @@ try:
             </div>
     """, unsafe_allow_html=True)
 
-    df_clusters = load_clusters()
-
-    cluster_summary = df_clusters.groupby('Cluster').agg({
+    # The clusters and the savings below are built from patient rows and
+    # their cluster labels, which streaming mode does not load
+    if df is None:
+        st.info("The clustering model needs patient-level data, which is not loaded in streaming mode. "
+                "Set HEALTHCARE_LOAD_MODE=memory to view it.")
+        show_section_timings()
+        st.stop()
+
+    # Every patient the segmentation model labelled, whatever the filters
+    clusters = load_cluster_labels(df)
+    if clusters is None:
+        st.info("No cluster labels were found. Place the segmentation model's output at "
+                "data/clustered_patients.csv (or set HEALTHCARE_CLUSTERS_PATH) to view this section.")
+        show_section_timings()
+        st.stop()
+    df_clusters = df.assign(Cluster=clusters)[clusters.notna()]
+
+    cluster_summary = df_clusters.groupby('Cluster', observed=True).agg({
         'Age': 'mean',
         'Billing Amount': ['mean', 'std'],
         'Length of Stay': ['mean', 'std'],
@@ -632,7 +705,7 @@ try:
 
 
     # Create a more detailed profile for each cluster including risk score
-    cluster_profiles = df_clusters.groupby('Cluster').agg({
+    cluster_profiles = df_clusters.groupby('Cluster', observed=True).agg({
         'Age': ['mean', 'std'],
         'Length of Stay': ['mean', 'std'],
         'Billing Amount': ['mean', 'std', 'median'],
@@ -709,6 +782,7 @@ try:
                 # bar chart
                 st.markdown("<h6 style='text-align: left;'>Clusters by Average Billing</h6>", unsafe_allow_html=True)
 
+                start_figure()
                 fig_top = px.bar(cluster_summary, y='Cluster', x='Billing Avg', 
                             labels={'Billing Avg': 'Average Billing ($)'},
                             text=cluster_summary['Billing Avg'].apply(lambda x: f"${x:,.0f}")
@@ -728,13 +802,14 @@ try:
                 fig_top.update_yaxes(
                     title=None
                 )
-                st.plotly_chart(fig_top, use_container_width=True)
+                timed_chart(fig_top, use_container_width=True)
 
             
             with column2:
                 # Box Plot
                 st.markdown("<h6 style='text-align: left;'>Distribution of Billing Amount by Cluster</h6>", unsafe_allow_html=True)    
 
+                start_figure()
                 fig = px.box(df_clusters, y='Cluster', x='Billing Amount' )
                 fig.update_layout(
                     plot_bgcolor='rgba(0,0,0,0)',
@@ -755,7 +830,7 @@ try:
                     tickformat=",",
                 )
             
-                st.plotly_chart(fig, use_container_width=True)    
+                timed_chart(fig, use_container_width=True)    
 
         st.markdown('''<div style="margin-top: 15px;"></div>''', unsafe_allow_html=True) # Adds space
 
@@ -767,6 +842,7 @@ try:
                 st.markdown("<h6 style='text-align: left;'>Patient Cluster Risk Matrix</h6>", unsafe_allow_html=True)
                 
                 # Create a risk scatter plot
+                start_figure()
                 fig = px.scatter(
                     cluster_profiles, 
                     x='Length of Stay_mean', 
@@ -803,7 +879,7 @@ try:
                 
                 fig.update_yaxes(tickprefix="$", tickformat=",", gridcolor='rgba(211,211,211,0.3)' )
 
-                st.plotly_chart(fig, use_container_width=True)
+                timed_chart(fig, use_container_width=True)
 
             # Column 2: Cluster Insights & Recommendations
             with column2:
@@ -846,6 +922,7 @@ try:
                 # Create table with colors based on risk
                 colors = {'High': '#ff6b6b', 'Medium': '#ffcc5c', 'Low': '#88d8b0'}
                 
+                start_figure()
                 fig = go.Figure(data=[go.Table(
                     header=dict(
                         values=list(insights_df.columns),
@@ -871,7 +948,7 @@ try:
                     margin=dict(l=0, r=0, t=10, b=0)
                 )
                 
-                st.plotly_chart(fig, use_container_width=True)
+                timed_chart(fig, use_container_width=True)
         
         st.markdown('''<div style="margin-top: 15px;"></div>''', unsafe_allow_html=True) # Adds space
 
@@ -884,6 +961,7 @@ try:
 
 
     # Cost Reduction Opportunities Section
+    start_section('Cost Reduction Opportunities')
     
 
     col1, col2 = st.columns(2, gap="large")
@@ -899,6 +977,7 @@ try:
         savings_data = savings_data.sort_values('Risk_Category', ascending=False)
         
         # Create savings opportunity chart
+        start_figure()
         fig = px.bar(
             savings_data,
             x='Cluster',
@@ -928,7 +1007,7 @@ try:
         )
 
         fig.update_yaxes(tickprefix="$", tickformat=",")
-        st.plotly_chart(fig, use_container_width=True)
+        timed_chart(fig, use_container_width=True)
 
     with col2:
 
@@ -941,6 +1020,7 @@ try:
         los_targets['Reduction'] = los_targets['Current LOS'] - los_targets['Target LOS']
         los_targets = los_targets.sort_values('Risk', ascending=False)
 
+        start_figure()
         fig = go.Figure()
         
         # Add bars for current LOS
@@ -984,15 +1064,9 @@ try:
             legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
         )
         
-        st.plotly_chart(fig, use_container_width=True)
-
-
-
-
-
-
-
+        timed_chart(fig, use_container_width=True)
 
+    show_section_timings()
 
 except Exception as e:
     st.error(f"Error loading data: {e}")
@@ -5,19 +5,17 @@ import plotly.graph_objects as go
 import numpy as np
 from statsmodels.tsa.holtwinters import ExponentialSmoothing
 from datetime import datetime, timedelta
-from utils import initialize_page, load_data, create_sidebar, create_page_navigation
+from utils import enter_page, start_section, start_figure, timed_chart, show_section_timings, load_data, aggregate_only, create_sidebar, create_page_navigation, slice_periods, load_daily_cube, load_catalog, cube_monthly_counts
 
-# Initialize page
-initialize_page()
 
 try:
-    # Load data
-    df = load_data()
+    # Load data (in streaming mode only the aggregates exist, df is None)
+    df = None if aggregate_only() else load_data()
     
     # Set current page for navigation
-    st.session_state['current_page'] = 'Trends & Forecasting'
+    enter_page('Trends & Forecasting')
 
-    current_start, current_end, prev_start, prev_end, comparison_label, prev_custom_start, filtered_df = create_sidebar(df)
+    current_start, current_end, prev_start, prev_end, comparison_label, prev_custom_start, selected_hospitals = create_sidebar(df)
     
     st.markdown("""<style>
                 [data-testid="stHorizontalBlock"] {
@@ -31,28 +29,24 @@ try:
     # Create navigation
     create_page_navigation()
 
-    if prev_custom_start is not None:
-        df_completed  = filtered_df[(filtered_df['Date of Admission'] <= current_end) & (filtered_df['Date of Admission'] >= prev_custom_start)]
-        df_completed_section2 = filtered_df[filtered_df['Date of Admission'] <= current_end]
-    else:
-        df_completed  = filtered_df[filtered_df['Date of Admission'] <= current_end]
-        df_completed_section2 = filtered_df[filtered_df['Date of Admission'] <= current_end]
+    # Monthly counts only need patients per day, so the page works off the
+    # daily cube, with or without the patient rows
+    cube = load_daily_cube(df)
 
-    # Filter data for current period
-    df_current = filtered_df[(filtered_df['Date of Admission'] >= current_start) & 
-                            (filtered_df['Date of Admission'] <= current_end)]
-    
-    # Filter data for previous period
+    # All history up to the end of the selected range (from the custom start, if any)
+    cube_completed, _ = slice_periods(cube, prev_custom_start, current_end, None, None, selected_hospitals)
+    cube_completed_section2, _ = slice_periods(cube, None, current_end, None, None, selected_hospitals)
+
+    # The previous period is extended to the end of its month
     if prev_start is not None and prev_end is not None:
         last_day = pd.Timestamp( year= prev_end.year, month = prev_end.month + 1, day=1 ) - timedelta(days=1)
         if prev_end != last_day:
-            df_prev = filtered_df[(filtered_df['Date of Admission'] >= prev_start) & 
-                                (filtered_df['Date of Admission'] <= last_day)]
-        else:
-            df_prev = filtered_df[(filtered_df['Date of Admission'] >= prev_start) & 
-                                (filtered_df['Date of Admission'] <= prev_end)]
-    else:
-        df_prev = None
+            prev_end = last_day
+
+    # Slice the current and previous periods out of the date-sorted cube
+    cube_current, cube_prev = slice_periods(
+        cube, current_start, current_end, prev_start, prev_end, selected_hospitals
+    )
 
     # Get period label for column title (PM, PQ, PY)
     if comparison_label == "":
@@ -64,6 +58,7 @@ try:
     # 
     # ------ Section 1: Historical Patient Volume Trends ------
     # 
+    start_section('Section 1: Historical Patient Volume Trends')
 
     st.markdown("""
         <div class="numberOfPatients">
@@ -75,16 +70,7 @@ try:
     
     with st.container(key='background'):
         # Create monthly aggregation for the entire dataset using the filtered data
-        df_monthly = df_completed.copy()
-        df_monthly['month_year'] = df_monthly['Date of Admission'].dt.to_period('M')
-        monthly_patients = df_monthly.groupby(['month_year']).agg({
-            'Patient ID': 'count'
-        }).reset_index()
-        
-        # Convert period to datetime for plotting
-        monthly_patients['month_year'] = monthly_patients['month_year'].dt.to_timestamp()
-        monthly_patients.sort_values('month_year', inplace=True)
-        monthly_patients.rename(columns={'Patient ID': 'Patient_Count'}, inplace=True)
+        monthly_patients = cube_monthly_counts(cube_completed)
         
         # Create marker sizes and colors for highlighting
         marker_sizes = [7] * len(monthly_patients)
@@ -94,26 +80,16 @@ try:
         current_data = None
         prev_data = None
         
-        if df_prev is not None:
+        if cube_prev is not None:
             # Aggregate data for current and previous periods
-            df_current['month_year'] = df_current['Date of Admission'].dt.to_period('M')
-            current_monthly = df_current.groupby(['month_year']).agg({
-                'Patient ID': 'count'
-            }).reset_index()
-            current_monthly['month_year'] = current_monthly['month_year'].dt.to_timestamp()
-            current_monthly.rename(columns={'Patient ID': 'Patient_Count'}, inplace=True)
+            current_monthly = cube_monthly_counts(cube_current)
             
             current_data = {
                 'x': current_monthly['month_year'].tolist(),
                 'y': current_monthly['Patient_Count'].tolist()
             }
             
-            df_prev['month_year'] = df_prev['Date of Admission'].dt.to_period('M')
-            prev_monthly = df_prev.groupby(['month_year']).agg({
-                'Patient ID': 'count'
-            }).reset_index()
-            prev_monthly['month_year'] = prev_monthly['month_year'].dt.to_timestamp()
-            prev_monthly.rename(columns={'Patient ID': 'Patient_Count'}, inplace=True)
+            prev_monthly = cube_monthly_counts(cube_prev)
             
             prev_data = {
                 'x': prev_monthly['month_year'].tolist(),
@@ -121,6 +97,7 @@ try:
             }
         
         # Create line chart
+        start_figure()
         fig = go.Figure()
         
         # Add main trend line
@@ -197,7 +174,7 @@ try:
             )
         )
         
-        st.plotly_chart(fig, use_container_width=False)
+        timed_chart(fig, use_container_width=False)
         
         # Add caption about the chart
         st.caption("Note: Chart shows patient volume by complete months. The current and previous periods (if selected) are highlighted with larger markers.")
@@ -206,18 +183,9 @@ try:
     # 
     # ------ Section 2: trend insights ------
     #
+    start_section('Section 2: trend insights')
 
-    df_monthly2 = df_completed_section2.copy()
-
-    df_monthly2['month_year'] = df_monthly2['Date of Admission'].dt.to_period('M')
-    monthly_patients2 = df_monthly2.groupby(['month_year']).agg({
-        'Patient ID': 'count'
-    }).reset_index()
-        
-    # Convert period to datetime for plotting
-    monthly_patients2['month_year'] = monthly_patients2['month_year'].dt.to_timestamp()   
-    monthly_patients2.sort_values('month_year', inplace=True)
-    monthly_patients2.rename(columns={'Patient ID': 'Patient_Count'}, inplace=True)
+    monthly_patients2 = cube_monthly_counts(cube_completed_section2)
     
     st.markdown("""
         <div class="numberOfPatients">
@@ -278,34 +246,36 @@ try:
         st.markdown("<h6 style='text-align: left; margin-top: 15px;'>Seasonality Patterns</h6>", unsafe_allow_html=True)
     
         # Create month-of-year analysis for seasonality using filtered data
-        df_seasonal = df_completed_section2.copy()
-        df_seasonal['month'] = df_seasonal['Date of Admission'].dt.month
-        df_seasonal['month_name'] = df_seasonal['Date of Admission'].dt.strftime('%b')  # 3-letter month abbreviation
-        df_seasonal['quarter'] = df_seasonal['Date of Admission'].dt.quarter
-        df_seasonal['year'] = df_seasonal['Date of Admission'].dt.year
-        df_seasonal = df_seasonal[df_seasonal['year'] < df_seasonal['year'].max()] # last year is not included
+        df_seasonal = pd.DataFrame({
+            'month': cube_completed_section2['Date of Admission'].dt.month,
+            'quarter': cube_completed_section2['Date of Admission'].dt.quarter,
+            'year': cube_completed_section2['Date of Admission'].dt.year,
+            'Patient_Count': cube_completed_section2['Patient_Count']
+        })
+        last_year = min(current_end, load_catalog(df)['max_date']).year
+        df_seasonal = df_seasonal[df_seasonal['year'] < last_year] # last year is not included
         
         monthly_pattern = df_seasonal.groupby('month').agg({
-            'Patient ID': 'count'
+            'Patient_Count': 'sum'
         }).reset_index()
         
         # Add month names (3-letter abbreviations)
         month_abbr = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 
                     'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
         monthly_pattern['month_name'] = monthly_pattern['month'].apply(lambda x: month_abbr[x-1])
-        monthly_pattern.rename(columns={'Patient ID': 'Patient_Count'}, inplace=True)
         
         # Create quarterly data
         quarterly_pattern = df_seasonal.groupby('quarter').agg({
-            'Patient ID': 'count'
+            'Patient_Count': 'sum'
         }).reset_index()
-        quarterly_pattern.rename(columns={'Patient ID': 'Patient_Count', 'quarter': 'Quarter'}, inplace=True)
+        quarterly_pattern.rename(columns={'quarter': 'Quarter'}, inplace=True)
         quarterly_pattern['Quarter_Name'] = quarterly_pattern['Quarter'].apply(lambda x: f'Q{x}')
         
 
         # Create bar chart for monthly seasonality
         monthly_pattern_sorted = monthly_pattern.sort_values('month')
         
+        start_figure()
         fig_season = go.Figure()
         
         # Add bars
@@ -341,7 +311,7 @@ try:
             )
         )
         
-        st.plotly_chart(fig_season, use_container_width=True)
+        timed_chart(fig_season, use_container_width=True)
 
         # Add note about data aggregation
         st.caption("Note: Data is aggregated across all years to identify consistent seasonal patterns.")
@@ -370,6 +340,7 @@ try:
 
 
         # Create quarterly chart
+        start_figure()
         fig_quarter = go.Figure()
         
         # Add bars for quarterly data
@@ -401,7 +372,7 @@ try:
             )
         )
         
-        st.plotly_chart(fig_quarter, use_container_width=True)
+        timed_chart(fig_quarter, use_container_width=True)
 
         st.caption("Note: In both charts the last not completed year is not included.")
 
@@ -411,6 +382,7 @@ try:
     # 
     # ------ Section 3: Forecasting ------
     # 
+    start_section('Section 3: Forecasting')
 
     st.markdown("""
         <div class="numberOfPatients">
@@ -460,6 +432,7 @@ try:
                 upper_bound = forecast_values + 1.28 * resid_std
                 
                 # Create forecast visualization
+                start_figure()
                 fig_forecast = go.Figure()
                 
                 # Add historical data
@@ -520,7 +493,7 @@ try:
                     )
                 )
                 
-                st.plotly_chart(fig_forecast, use_container_width=False)
+                timed_chart(fig_forecast, use_container_width=False)
                 st.caption("Note: Forecast is based on completed months only. The shaded area represents the 80% confidence interval.")
                 
 
@@ -597,6 +570,8 @@ try:
             </div>
             """, unsafe_allow_html=True)
 
+    show_section_timings()
+
 except Exception as e:
     st.error(f"Error: {e}")
     st.stop()
\ No newline at end of file
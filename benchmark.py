@@ -0,0 +1,245 @@
+# benchmark.py
+# Runs every page headlessly (Streamlit's AppTest) against synthetic datasets
+# of several sizes and records wall time and memory per page and sidebar
+# scenario. Results are written as JSON so two commits can be compared; an
+# older commit can be checked out next to this one and benchmarked in place:
+#
+#   git worktree add ../before <commit>
+#   python benchmark.py --app-dir ../before --output before.json
+#   python benchmark.py --output after.json
+#   python benchmark.py --compare before.json after.json
+#
+# HEALTHCARE_* settings (load mode, query backend, ...) are passed through
+# to the app and recorded with the results.
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_PATH = os.path.join(APP_DIR, "data", "Healthcare Analysis Dataset.csv")
+SYNTHETIC_DIR = os.path.join(APP_DIR, "data", "synthetic")
+
+PAGE_NAMES = ['Executive_Summary', 'Patient_Demographics', 'Hospital_Performance',
+              'Insurance_&_Billing', 'Trends_&_Forecasting']
+SCENARIOS = ["Last Month", "Last Quarter", "Last Year", "Custom"]
+
+# Where the app of any commit reads its data, relative to the working directory
+DATA_FILES = {
+    'data': "Healthcare Analysis Dataset.csv",
+    'clusters': "clustered_patients.csv"
+}
+
+def page_scripts(app_dir):
+    # The page scripts of the checked-out app, relative to Home.py. Pages
+    # live in app_pages/ since they are routed with st.navigation; before
+    # that they were in pages/ and Home.py was the Executive Summary.
+    if os.path.isdir(os.path.join(app_dir, 'app_pages')):
+        return [f'app_pages/{i}_{name}.py' for i, name in enumerate(PAGE_NAMES)]
+    return ['Home.py'] + [f'pages/{i}_{name}.py' for i, name in enumerate(PAGE_NAMES) if i]
+
+def synthetic_paths(rows):
+    directory = os.path.join(SYNTHETIC_DIR, str(rows))
+    return (os.path.join(directory, "Healthcare Analysis Dataset.csv"),
+            os.path.join(directory, "clustered_patients.csv"))
+
+def generate_dataset(rows, seed=0):
+    # Synthetic patients with the distributions of the source CSV (or the
+    # generator's built-in profile without it). Existing files are reused.
+    data_path, clusters_path = synthetic_paths(rows)
+    if os.path.exists(data_path) and os.path.exists(clusters_path):
+        return data_path, clusters_path
+
+    # Imported here so the benchmarked app's own utils is the one its pages get
+    from synthetic_data import fit_profile, generate
+
+    profile = fit_profile(SOURCE_PATH) if os.path.exists(SOURCE_PATH) else None
+    generate(rows, csv_path=data_path, clusters_path=clusters_path, profile=profile, seed=seed)
+    return data_path, clusters_path
+
+def current_rss_bytes():
+    # Resident memory of this process (Linux); None where /proc is missing
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+def measure(run):
+    # Wall time of run(), the highest resident memory seen while it ran
+    # (sampled every few milliseconds) and the resident memory before it.
+    # The worker keeps the caches of earlier runs, so the peak minus the
+    # memory before is what this run added. Without /proc only the
+    # process-wide peak (getrusage) is known and the memory before is None.
+    before = current_rss_bytes()
+    peak = [before or 0]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.005):
+            peak[0] = max(peak[0], current_rss_bytes() or 0)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        run()
+    finally:
+        wall = time.perf_counter() - start
+        done.set()
+        sampler.join()
+
+    if not peak[0]:
+        import resource
+        scale = 1 if sys.platform == 'darwin' else 1024
+        peak[0] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    return wall, peak[0], before
+
+def open_page(app_dir, pages, page, scenario, cold, timeout):
+    # One fresh session, set up so that a single script run renders the
+    # page with the scenario: the first page is opened (unless this is the
+    # cold run, whose first open is what is measured) and the scenario is
+    # preset in session state. Returns that run, which is all measure() times.
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(app_dir, "Home.py"), default_timeout=timeout)
+    if not cold:
+        at.run()
+    at.session_state['time_period_selector'] = scenario
+
+    def run():
+        if page == pages[0]:
+            at.run()
+        else:
+            at.switch_page(page).run()
+        return [e.value for e in at.error] + [str(e.value) for e in at.exception]
+    return run
+
+def run_worker(rows, app_dir, timeout, output):
+    # Runs in its own process per dataset, so caches and memory of one
+    # dataset size never leak into the next. The working directory is a
+    # scratch copy of the app (see app_workdir).
+    # Streamlit's deprecation warnings would drown the progress lines
+    logging.disable(logging.WARNING)
+    sys.path.insert(0, app_dir)
+    pages = page_scripts(app_dir)
+    results = []
+
+    def record(page, scenario, cold):
+        errors = []
+        run = open_page(app_dir, pages, page, scenario, cold, timeout)
+        wall, peak, before = measure(lambda: errors.extend(run()))
+        delta = (peak - before) / 2**20 if before is not None else None
+        # Pages are named as in app_pages/ whatever the commit
+        name = f'app_pages/{os.path.basename(page)}' if page != 'Home.py' else f'app_pages/0_{PAGE_NAMES[0]}.py'
+        results.append({
+            'rows': rows, 'page': name, 'scenario': scenario, 'cold': cold, 'wall_s': round(wall, 4),
+            'rss_delta_mb': round(delta, 1) if delta is not None else None,
+            'process_peak_rss_mb': round(peak / 2**20, 1), 'errors': errors
+        })
+        print(f"{rows:>10,} {name:<40} {scenario:<13} {'cold' if cold else 'warm'} {wall:8.2f} s "
+              f"{'+%8.0f MB' % delta if delta is not None else '         -'}{' ERROR' if errors else ''}",
+              flush=True)
+
+    # The first run loads the dataset and builds every shared cache
+    record(pages[0], SCENARIOS[0], True)
+    for page in pages:
+        for scenario in SCENARIOS:
+            record(page, scenario, False)
+
+    with open(output, 'w') as f:
+        json.dump(results, f)
+
+def git_commit(app_dir):
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=app_dir, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def app_workdir(app_dir, data_path, clusters_path, workdir):
+    # Apps before HEALTHCARE_DATA_PATH read data/ (and assets/) relative to
+    # the working directory. The worker runs in `workdir`, which links to
+    # everything in the app except data/, whose files link to the dataset.
+    for entry in os.listdir(app_dir):
+        if entry not in ('data', '.git'):
+            os.symlink(os.path.join(app_dir, entry), os.path.join(workdir, entry))
+    os.mkdir(os.path.join(workdir, 'data'))
+    os.symlink(data_path, os.path.join(workdir, 'data', DATA_FILES['data']))
+    os.symlink(clusters_path, os.path.join(workdir, 'data', DATA_FILES['clusters']))
+
+def run_benchmark(row_counts, app_dir, output, timeout):
+    import streamlit
+
+    report = {
+        'commit': git_commit(app_dir),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'streamlit': streamlit.__version__,
+        'settings': {key: value for key, value in os.environ.items() if key.startswith('HEALTHCARE_')},
+        'results': []
+    }
+
+    for rows in row_counts:
+        data_path, clusters_path = generate_dataset(rows)
+        env = dict(os.environ, HEALTHCARE_DATA_PATH=data_path, HEALTHCARE_CLUSTERS_PATH=clusters_path)
+        with tempfile.TemporaryDirectory() as workdir:
+            app_workdir(app_dir, data_path, clusters_path, workdir)
+            worker_output = os.path.join(workdir, 'results.json')
+            subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--worker', str(rows), '--app-dir', app_dir,
+                 '--timeout', str(timeout), '--output', worker_output],
+                cwd=workdir, env=env, check=True
+            )
+            with open(worker_output) as f:
+                report['results'].extend(json.load(f))
+
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f"Results written to {output}")
+
+def compare(before_path, after_path):
+    # Wall time and memory added by every run in both files side by side,
+    # with the after/before ratios
+    with open(before_path) as f:
+        before = pd.DataFrame(json.load(f)['results'])
+    with open(after_path) as f:
+        after = pd.DataFrame(json.load(f)['results'])
+
+    keys = ['rows', 'page', 'scenario', 'cold']
+    table = before.merge(after, on=keys, how='outer', suffixes=('_before', '_after'))
+    table['wall_ratio'] = table['wall_s_after'] / table['wall_s_before']
+    table['memory_ratio'] = table['rss_delta_mb_after'] / table['rss_delta_mb_before']
+    table['page'] = table['page'].str.replace('app_pages/', '', regex=False)
+    columns = keys + ['wall_s_before', 'wall_s_after', 'wall_ratio',
+                      'rss_delta_mb_before', 'rss_delta_mb_after', 'memory_ratio']
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(table[columns].round(3).to_string(index=False))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard pages on synthetic datasets.")
+    parser.add_argument('--rows', type=int, nargs='+', default=[55_000, 1_000_000, 10_000_000],
+                        help="dataset sizes to run (default: 55000 1000000 10000000)")
+    parser.add_argument('--output', default='benchmark_results.json', help="where to write the results")
+    parser.add_argument('--app-dir', default=APP_DIR,
+                        help="checkout of the app to benchmark (default: the one this file is in)")
+    parser.add_argument('--timeout', type=float, default=3600, help="seconds allowed per page run")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="compare two result files")
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    elif args.worker:
+        run_worker(args.worker, os.path.abspath(args.app_dir), args.timeout, args.output)
+    else:
+        run_benchmark(args.rows, os.path.abspath(args.app_dir), args.output, args.timeout)
@@ -0,0 +1,276 @@
+# synthetic_data.py
+# Generates patient records with the columns load_data expects, for load and
+# scale testing. Rows are produced and written in chunks, so the row count is
+# only limited by disk space:
+#
+#   python synthetic_data.py --rows 100000000 --hospitals 300 \
+#       --csv "data/synthetic/100M/Healthcare Analysis Dataset.csv" \
+#       --clusters-csv data/synthetic/100M/clustered_patients.csv
+#
+# Marginal distributions, length of stay and seasonality come from a profile.
+# The built-in one follows the challenge dataset; --fit estimates one from an
+# existing CSV instead.
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils import CATEGORICAL_SCHEMA, DATE_FORMAT, columnar_cache_paths
+
+COLUMNS = [
+    'Patient ID', 'Age', 'Gender', 'Blood Type', 'Medical Condition', 'Date of Admission',
+    'Doctor', 'Hospital', 'Insurance Provider', 'Billing Amount', 'Room Number', 'Admission Type',
+    'Discharge Date', 'Medication', 'Test Results', 'Hospital Latitude', 'Hospital Longitude'
+]
+
+# Columns drawn independently from their frequencies in the profile
+SAMPLED_COLUMNS = ['Gender', 'Blood Type', 'Medical Condition', 'Insurance Provider',
+                   'Admission Type', 'Medication', 'Test Results', 'Doctor']
+
+# Percentiles stored for billing amounts; sampling interpolates between them
+BILLING_LEVELS = np.linspace(0, 1, 101)
+
+# Metro areas hospitals are placed around when they are generated
+METRO_LOCATIONS = [
+    (40.7, -74.0), (34.05, -118.2), (41.9, -87.6), (29.7, -95.3), (33.4, -112.1),
+    (39.9, -75.1), (29.4, -98.5), (32.7, -117.2), (32.8, -96.8), (37.3, -121.9),
+    (30.3, -97.7), (30.3, -81.7), (32.8, -97.3), (39.96, -83.0), (35.2, -80.8),
+    (37.8, -122.4), (39.8, -86.2), (47.6, -122.3), (39.7, -105.0), (38.9, -77.0),
+    (42.4, -71.1), (36.2, -86.8), (42.3, -83.0), (45.5, -122.7), (36.2, -115.1),
+    (35.1, -90.0), (38.3, -85.8), (39.3, -76.6), (43.0, -87.9), (35.1, -106.6)
+]
+SURNAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+            'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor',
+            'Moore', 'Jackson', 'Martin', 'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez',
+            'Clark', 'Ramirez', 'Lewis', 'Robinson', 'Walker', 'Young', 'Allen', 'King', 'Wright',
+            'Scott', 'Torres', 'Nguyen', 'Hill', 'Flores', 'Green', 'Adams', 'Nelson', 'Baker', 'Kim']
+COMPANY_SUFFIXES = ['Ltd', 'Co', 'LLC', 'PLC', 'Inc', 'Group', 'and Sons']
+
+def uniform(values):
+    return {value: 1.0 for value in values}
+
+def default_profile():
+    # Close to the challenge dataset: categories almost evenly spread, ages
+    # 13-89, billing between 1,000 and 52,000, stays of 1-30 days over five
+    # years, with more admissions in winter and fewer at weekends
+    categories = {column: uniform(values) for column, values in CATEGORICAL_SCHEMA.items() if values}
+    categories['Doctor'] = uniform(['Dr ' + name for name in SURNAMES[:20]])
+    return {
+        'categories': categories,
+        'age': uniform(range(13, 90)),
+        'billing': {condition: list(1000 + 51000 * BILLING_LEVELS) for condition in categories['Medical Condition']},
+        'stay_days': uniform(range(1, 31)),
+        'monthly_weights': [1.12, 1.08, 1.02, 0.97, 0.95, 0.93, 0.94, 0.96, 0.99, 1.0, 1.02, 1.02],
+        'weekday_weights': [1.05, 1.04, 1.02, 1.01, 1.0, 0.94, 0.94],
+        'start': '2019-05-08',
+        'end': '2024-05-06',
+        'hospitals': None
+    }
+
+def frequencies(series):
+    counts = series.value_counts()
+    return {key: float(count) for key, count in counts.items()}
+
+def fit_profile(url):
+    # Estimates every distribution of the profile from an existing CSV with
+    # the same columns. Seasonal weights are admissions per calendar day of
+    # each month and weekday, relative to the average.
+    df = pd.read_csv(url)
+    admissions = pd.to_datetime(df['Date of Admission'], format=DATE_FORMAT, errors='coerce')
+    discharges = pd.to_datetime(df['Discharge Date'], format=DATE_FORMAT, errors='coerce')
+    valid = admissions.notna() & discharges.notna() & (discharges >= admissions)
+    df, admissions, discharges = df[valid], admissions[valid], discharges[valid]
+
+    days = pd.Series(pd.date_range(admissions.min(), admissions.max(), freq='D'))
+    monthly = admissions.dt.month.value_counts() / days.dt.month.value_counts()
+    weekday = admissions.dt.weekday.value_counts() / days.dt.weekday.value_counts()
+
+    hospitals = df.groupby('Hospital').agg(
+        latitude=('Hospital Latitude', 'first'),
+        longitude=('Hospital Longitude', 'first'),
+        weight=('Hospital', 'size')
+    ).reset_index()
+
+    return {
+        'categories': {column: frequencies(df[column]) for column in SAMPLED_COLUMNS},
+        'age': frequencies(df['Age']),
+        'billing': {
+            condition: list(np.quantile(rows['Billing Amount'], BILLING_LEVELS))
+            for condition, rows in df.groupby('Medical Condition')
+        },
+        'stay_days': frequencies((discharges - admissions).dt.days),
+        'monthly_weights': list((monthly / monthly.mean()).reindex(range(1, 13), fill_value=0)),
+        'weekday_weights': list((weekday / weekday.mean()).reindex(range(7), fill_value=0)),
+        'start': admissions.min().strftime('%Y-%m-%d'),
+        'end': admissions.max().strftime('%Y-%m-%d'),
+        'hospitals': [tuple(row) for row in hospitals[['Hospital', 'latitude', 'longitude', 'weight']].itertuples(index=False)]
+    }
+
+def generate_hospitals(count, rng):
+    # Distinct company-style names around the metro areas, with lognormal
+    # sizes so a few hospitals take a large share of the patients
+    names = [f"{surname} {suffix}" for suffix in COMPANY_SUFFIXES for surname in SURNAMES]
+    names += [f"{first} and {second}" for first in SURNAMES for second in SURNAMES if first != second]
+    if count > len(names):
+        raise ValueError(f"At most {len(names)} hospitals can be generated")
+
+    names = [names[i] for i in rng.permutation(len(names))[:count]]
+    metros = rng.integers(0, len(METRO_LOCATIONS), count)
+    latitudes = np.array([METRO_LOCATIONS[m][0] for m in metros]) + rng.uniform(-0.3, 0.3, count)
+    longitudes = np.array([METRO_LOCATIONS[m][1] for m in metros]) + rng.uniform(-0.3, 0.3, count)
+    weights = rng.lognormal(0, 0.5, count)
+    return list(zip(names, latitudes.round(4), longitudes.round(4), weights))
+
+def choice(rng, distribution, size):
+    # Draws from {value: weight}
+    values = list(distribution)
+    weights = np.array([distribution[value] for value in values], dtype=float)
+    picked = rng.choice(len(values), size, p=weights / weights.sum())
+    return np.asarray(values, dtype=object)[picked]
+
+def admission_day_weights(profile, start, end):
+    days = pd.date_range(start, end, freq='D')
+    monthly = np.asarray(profile['monthly_weights'])[days.month - 1]
+    weekday = np.asarray(profile['weekday_weights'])[days.weekday]
+    weights = monthly * weekday
+    return days, weights / weights.sum()
+
+def cluster_prototypes(clusters, profile, rng):
+    # One prototype per cluster in (age, billing, condition) space; patients
+    # join the nearest one, so clusters follow the data like the K-Prototypes
+    # labels do
+    ages = np.array(list(profile['age']), dtype=float)
+    conditions = list(profile['billing'])
+    return {
+        'age': rng.uniform(ages.min(), ages.max(), clusters),
+        'billing': rng.uniform(0, 1, clusters),
+        'condition': np.array(conditions, dtype=object)[rng.integers(0, len(conditions), clusters)]
+    }
+
+def assign_clusters(chunk, billing_rank, prototypes, age_range):
+    age = chunk['Age'].to_numpy(dtype=float)[:, None]
+    distance = ((age - prototypes['age']) / age_range) ** 2
+    distance += (billing_rank[:, None] - prototypes['billing']) ** 2
+    distance += 0.5 * (chunk['Medical Condition'].to_numpy()[:, None] != prototypes['condition'])
+    return distance.argmin(axis=1)
+
+DATE_COLUMNS = ['Date of Admission', 'Discharge Date']
+
+def csv_chunk(chunk):
+    # Dates as text in DATE_FORMAT, the way the source CSV stores them
+    if DATE_FORMAT == '%Y-%m-%d':
+        return chunk.assign(**{column: np.datetime_as_string(chunk[column].to_numpy(), unit='D') for column in DATE_COLUMNS})
+    return chunk.assign(**{column: chunk[column].dt.strftime(DATE_FORMAT) for column in DATE_COLUMNS})
+
+def generate_chunk(first_id, size, profile, hospitals, days, day_weights, rng):
+    chunk = pd.DataFrame({'Patient ID': np.arange(first_id, first_id + size)})
+    chunk['Age'] = choice(rng, profile['age'], size).astype(int)
+    for column in SAMPLED_COLUMNS:
+        chunk[column] = choice(rng, profile['categories'][column], size)
+
+    admissions = days.to_numpy()[rng.choice(len(days), size, p=day_weights)]
+    stays = choice(rng, profile['stay_days'], size).astype(int).astype('timedelta64[D]')
+    chunk['Date of Admission'] = admissions
+    chunk['Discharge Date'] = admissions + stays
+
+    hospital_weights = np.array([hospital[3] for hospital in hospitals], dtype=float)
+    picked = rng.choice(len(hospitals), size, p=hospital_weights / hospital_weights.sum())
+    chunk['Hospital'] = np.array([hospital[0] for hospital in hospitals], dtype=object)[picked]
+    chunk['Hospital Latitude'] = np.array([hospital[1] for hospital in hospitals])[picked]
+    chunk['Hospital Longitude'] = np.array([hospital[2] for hospital in hospitals])[picked]
+
+    # Billing follows the quantiles of the patient's condition
+    billing_rank = rng.uniform(0, 1, size)
+    billing = np.empty(size)
+    for condition, quantiles in profile['billing'].items():
+        rows = chunk['Medical Condition'].to_numpy() == condition
+        billing[rows] = np.interp(billing_rank[rows], BILLING_LEVELS, quantiles)
+    chunk['Billing Amount'] = billing.round(2)
+    chunk['Room Number'] = rng.integers(101, 500, size)
+
+    return chunk[COLUMNS], billing_rank
+
+def parquet_table(chunk):
+    # Dates are stored as Parquet dates rather than timestamps
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(chunk, preserve_index=False)
+    for column in DATE_COLUMNS:
+        dates = pa.array(chunk[column].to_numpy().astype('datetime64[D]'))
+        table = table.set_column(table.schema.get_field_index(column), column, dates)
+    return table
+
+def generate(rows, csv_path=None, parquet_path=None, clusters_path=None, hospitals=None,
+             clusters=6, profile=None, chunk_size=1_000_000, seed=0, start=None, end=None):
+    # Writes `rows` patients to any of a CSV, a Parquet file (dates typed as
+    # dates) and a clustered_patients.csv with a Cluster column, chunk by
+    # chunk. Files are written next to their target and renamed when done.
+    #   hospitals: how many hospitals to generate; None keeps the profile's
+    #   start, end: admission date range; defaults to the profile's
+    if not (csv_path or parquet_path or clusters_path):
+        raise ValueError("Nothing to write: give a CSV, Parquet or clusters path")
+    if csv_path and parquet_path and os.path.abspath(parquet_path) == os.path.abspath(columnar_cache_paths(csv_path)[0]):
+        raise ValueError(f"{parquet_path} is where the app keeps its own columnar cache of {csv_path}")
+
+    profile = profile or default_profile()
+    rng = np.random.default_rng(seed)
+    if hospitals is not None or not profile['hospitals']:
+        hospitals = generate_hospitals(hospitals or 10, rng)
+    else:
+        hospitals = profile['hospitals']
+    days, day_weights = admission_day_weights(profile, start or profile['start'], end or profile['end'])
+    prototypes = cluster_prototypes(clusters, profile, rng)
+    ages = np.array(list(profile['age']), dtype=float)
+    age_range = max(ages.max() - ages.min(), 1)
+
+    outputs = [path for path in (csv_path, parquet_path, clusters_path) if path]
+    for path in outputs:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if os.path.exists(path + ".tmp"):
+            os.remove(path + ".tmp")
+
+    parquet_writer = None
+    try:
+        for first in range(0, rows, chunk_size):
+            chunk, billing_rank = generate_chunk(
+                first + 1, min(chunk_size, rows - first), profile, hospitals, days, day_weights, rng
+            )
+            if csv_path:
+                csv_chunk(chunk).to_csv(csv_path + ".tmp", mode='a', header=first == 0, index=False)
+            if parquet_path:
+                table = parquet_table(chunk)
+                if parquet_writer is None:
+                    import pyarrow.parquet as pq
+                    parquet_writer = pq.ParquetWriter(parquet_path + ".tmp", table.schema)
+                parquet_writer.write_table(table)
+            if clusters_path:
+                labelled = csv_chunk(chunk).assign(Cluster=assign_clusters(chunk, billing_rank, prototypes, age_range))
+                labelled.to_csv(clusters_path + ".tmp", mode='a', header=first == 0, index=False)
+    finally:
+        if parquet_writer is not None:
+            parquet_writer.close()
+
+    for path in outputs:
+        os.replace(path + ".tmp", path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate synthetic patient records.")
+    parser.add_argument('--rows', type=int, required=True, help="number of patients")
+    parser.add_argument('--csv', help="CSV file to write, in the format load_data reads")
+    parser.add_argument('--parquet', help="Parquet file to write")
+    parser.add_argument('--clusters-csv', help="clustered_patients.csv to write")
+    parser.add_argument('--hospitals', type=int, help="number of hospitals (default: the profile's, or 10)")
+    parser.add_argument('--clusters', type=int, default=6, help="number of patient clusters (default: 6)")
+    parser.add_argument('--fit', help="CSV to estimate the distributions from instead of the built-in profile")
+    parser.add_argument('--start', help="first admission date, YYYY-MM-DD")
+    parser.add_argument('--end', help="last admission date, YYYY-MM-DD")
+    parser.add_argument('--chunk-size', type=int, default=1_000_000, help="rows generated per chunk")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    generate(
+        args.rows, args.csv, args.parquet, args.clusters_csv, hospitals=args.hospitals,
+        clusters=args.clusters, profile=fit_profile(args.fit) if args.fit else None,
+        chunk_size=args.chunk_size, seed=args.seed, start=args.start, end=args.end
+    )
@@ -0,0 +1,19 @@
+# Lets the tests import the app's modules from the repository root
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import utils
+from synthetic_data import generate
+
+@pytest.fixture(scope='session')
+def patient_table(tmp_path_factory):
+    # A small synthetic patient table, loaded the way load_shared_dataset
+    # does but left unstamped
+    path = str(tmp_path_factory.mktemp('data') / 'patients.csv')
+    generate(5000, csv_path=path, hospitals=6, seed=1)
+    df, _ = utils.parse_source_csv(path)
+    return utils.sort_by_admission(utils.apply_schema(df))
@@ -0,0 +1,74 @@
+# The pandas and SQLite query backends must return the same results for every
+# aggregation the pages run through compare_periods, for several periods, with
+# and without a previous period and a hospital filter.
+import logging
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+import utils
+
+# Streamlit warns about the missing runtime on every cached call
+logging.getLogger('streamlit').setLevel(logging.ERROR)
+
+QUERIES = {
+    'billing by hospital': (['Hospital'], {'Total_Billing': ('Billing Amount', 'sum'),
+                                           'Patient_Count': ('Patient ID', 'size')}),
+    'billing by gender': (['Gender'], {'Total_Billing': ('Billing Amount', 'sum')}),
+    'insurers': (['Insurance Provider'], {'Patient_Count': ('Patient ID', 'count'),
+                                          'Avg_Billing': ('Billing Amount', 'mean')}),
+    'condition billing': (['Medical Condition'], {'Avg_Billing': ('Billing Amount', 'mean')}),
+    'female billing by insurer': (['Insurance Provider'], {'Female_Billing': ('Billing Amount', 'sum', ('Gender', 'Female'))})
+}
+
+# (start, end) as days before the last admission; None leaves that side open
+PERIODS = {
+    'last 30 days': (30, 0),
+    'last year': (365, 0),
+    'up to the last admission': (None, 0),
+    'after the last admission': (-1, None)
+}
+
+HOSPITAL_FILTERS = ['all hospitals', 'two hospitals']
+
+@pytest.fixture(scope='module')
+def patients(patient_table):
+    # Stamped so the SQLite backend can key its copy on it
+    df = utils.stamp_dataset(patient_table.copy(), 'backend-parity')
+    # An unstamped frame would silently fall back to pandas
+    assert utils.dataset_version_of(df) == 'backend-parity'
+    return df
+
+def period_bounds(df, period):
+    max_date = df['Date of Admission'].max()
+    start, end = PERIODS[period]
+    return (max_date - timedelta(days=start) if start is not None else None,
+            max_date - timedelta(days=end) if end is not None else None)
+
+def hospital_filter(df, name):
+    return [] if name == 'all hospitals' else df['Hospital'].cat.categories[:2].tolist()
+
+def previous_period(start, end):
+    # The period of equal length before [start, end]; none for an open start
+    if start is None:
+        return None, None
+    prev_end = start - timedelta(days=1)
+    return prev_end - (end - start if end is not None else timedelta(days=30)), prev_end
+
+@pytest.mark.parametrize('how', ['inner', 'outer'])
+@pytest.mark.parametrize('hospitals', HOSPITAL_FILTERS)
+@pytest.mark.parametrize('period', PERIODS)
+@pytest.mark.parametrize('query', QUERIES)
+def test_compare_periods(patients, query, period, hospitals, how):
+    by, measures = QUERIES[query]
+    start, end = period_bounds(patients, period)
+    prev_start, prev_end = previous_period(start, end)
+    hospitals = hospital_filter(patients, hospitals)
+
+    expected = utils.compare_periods(patients, by, start, end, prev_start, prev_end, hospitals,
+                                     how=how, backend='pandas', **measures)
+    actual = utils.compare_periods(patients, by, start, end, prev_start, prev_end, hospitals,
+                                   how=how, backend='sqlite', **measures)
+    assert len(expected) > 0 or period == 'after the last admission'
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, rtol=1e-9)
@@ -0,0 +1,20 @@
+# The billing histogram's edges cover the whole billing range, with no empty
+# bin past the highest bill
+import numpy as np
+import pytest
+
+import utils
+
+@pytest.mark.parametrize('billing_range', [(1000, 52764), (-2008, 52764), (1000, 61000), (0, 0), (0, 999.5)])
+def test_edges_end_at_the_highest_bill(billing_range):
+    low, high = billing_range
+    edges = utils.billing_edges({'billing_range': billing_range})
+    assert 2 <= len(edges) <= 13
+    assert edges[0] <= low and edges[-2] <= high <= edges[-1]
+    assert (edges % utils.BILLING_BIN_WIDTH == 0).all()
+
+def test_last_bin_has_patients(patient_table):
+    edges = utils.billing_edges(utils.load_catalog(patient_table))
+    counts = np.histogram(patient_table['Billing Amount'].dropna(), bins=edges)[0]
+    assert counts[0] > 0 and counts[-1] > 0
+    assert counts.sum() == patient_table['Billing Amount'].notna().sum()
@@ -0,0 +1,19 @@
+# Cluster labels are optional and joined on Patient ID, which need not be
+# unique in either file
+import pandas as pd
+
+import utils
+
+def test_labels_join_duplicate_patient_ids(tmp_path):
+    path = tmp_path / 'clustered_patients.csv'
+    pd.DataFrame({'Patient ID': [1, 2, 2, 3], 'Cluster': [0, 1, 1, None]}).to_csv(path, index=False)
+    df = pd.DataFrame({'Patient ID': [2, 1, 2, 3, 4]})
+
+    labels = utils.cluster_labels(df, 'test', url=str(path))
+    assert labels.tolist()[:3] == ['Cluster 2', 'Cluster 1', 'Cluster 2']
+    assert labels.iloc[3:].isna().all()
+    assert list(labels.cat.categories) == ['Cluster 1', 'Cluster 2']
+
+def test_missing_clusters_file(patient_table, monkeypatch, tmp_path):
+    monkeypatch.setattr(utils, 'CLUSTERS_PATH', str(tmp_path / 'missing.csv'))
+    assert utils.load_cluster_labels(patient_table) is None
@@ -0,0 +1,34 @@
+# The columnar cache is swapped in through temporary files of its own, and
+# a failed write leaves neither a cache nor temporary files behind
+import os
+
+import pandas as pd
+
+import utils
+
+def write_csv(tmp_path):
+    path = tmp_path / 'patients.csv'
+    path.write_text('Patient ID,Billing Amount\n1,10.5\n2,20.0\n')
+    return str(path)
+
+def test_cache_round_trip(tmp_path):
+    csv_path = write_csv(tmp_path)
+    df = pd.DataFrame({'Patient ID': [1, 2], 'Billing Amount': [10.5, 20.0]})
+    utils.write_columnar_cache(df, csv_path, {'rows': 2})
+
+    parquet_path, meta_path = utils.columnar_cache_paths(csv_path)
+    assert utils.columnar_cache_is_fresh(csv_path, meta_path)
+    pd.testing.assert_frame_equal(pd.read_parquet(parquet_path), df)
+    assert sorted(os.listdir(tmp_path)) == ['patients.csv', 'patients.parquet', 'patients.parquet.json']
+
+def test_failed_write_cleans_up(tmp_path, monkeypatch):
+    csv_path = write_csv(tmp_path)
+
+    def fail(self, path, **kwargs):
+        raise OSError('disk full')
+    monkeypatch.setattr(pd.DataFrame, 'to_parquet', fail)
+    utils.write_columnar_cache(pd.DataFrame({'Patient ID': [1, 2]}), csv_path)
+
+    _, meta_path = utils.columnar_cache_paths(csv_path)
+    assert not utils.columnar_cache_is_fresh(csv_path, meta_path)
+    assert os.listdir(tmp_path) == ['patients.csv']
@@ -0,0 +1,46 @@
+# top_values merges Space-Saving summaries: every listed value's true count
+# must lie in [Count - Error, Count], and with enough capacity the list must
+# be the exact ranking.
+import functools
+from datetime import timedelta
+
+import pytest
+
+import utils
+
+def true_counts(df, column, start, end, hospitals):
+    rows = df.iloc[utils.period_rows(df, start, end, hospitals)]
+    return rows[column].value_counts()
+
+def periods(df):
+    # Whole years, a period cutting through months at both ends, one
+    # inside a single month and an open one
+    min_date, max_date = df['Date of Admission'].min(), df['Date of Admission'].max()
+    return [
+        (None, None),
+        (max_date - timedelta(days=365), max_date),
+        (min_date + timedelta(days=40), max_date - timedelta(days=40)),
+        (max_date - timedelta(days=10), max_date - timedelta(days=3)),
+        (None, min_date + timedelta(days=200))
+    ]
+
+@pytest.mark.parametrize('two_hospitals', [False, True])
+@pytest.mark.parametrize('column', utils.HEAVY_HITTER_COLUMNS)
+def test_counts_are_bounded(patient_table, monkeypatch, column, two_hospitals):
+    # Capacity 2 is below the number of distinct values, so summaries evict
+    monkeypatch.setattr(utils, 'heavy_hitter_sketches', functools.partial(utils.heavy_hitter_sketches, capacity=2))
+    hospitals = tuple(patient_table['Hospital'].cat.categories[:2]) if two_hospitals else ()
+    for start, end in periods(patient_table):
+        top = utils.top_values(patient_table, column, start, end, hospitals)
+        true = true_counts(patient_table, column, start, end, list(hospitals)).reindex(top[column], fill_value=0)
+        assert (top['Count'] - top['Error'] <= true.to_numpy()).all()
+        assert (true.to_numpy() <= top['Count']).all()
+
+@pytest.mark.parametrize('column', utils.HEAVY_HITTER_COLUMNS)
+def test_exact_within_capacity(patient_table, column):
+    for start, end in periods(patient_table):
+        top = utils.top_values(patient_table, column, start, end, n=3)
+        true = true_counts(patient_table, column, start, end, [])
+        true = true[true > 0].sort_values(ascending=False, kind='stable')
+        assert (top['Error'] == 0).all()
+        assert top['Count'].tolist() == true.head(3).tolist()
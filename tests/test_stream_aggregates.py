@@ -0,0 +1,48 @@
+# Streaming the CSV in small chunks gives the same aggregates as one chunk,
+# and writes every rejected row to the quarantine file
+import logging
+
+import pandas as pd
+import pytest
+
+import utils
+from synthetic_data import generate
+
+# Streamlit warns about the missing runtime on every cached call
+logging.getLogger('streamlit').setLevel(logging.ERROR)
+
+@pytest.fixture(scope='module')
+def patients_csv(tmp_path_factory):
+    # Every 97th admission date is blanked and every 89th discharge is
+    # replaced by one that does not parse
+    path = str(tmp_path_factory.mktemp('stream') / 'patients.csv')
+    generate(1500, csv_path=path, hospitals=4, seed=2)
+    df = pd.read_csv(path)
+    df.loc[::97, 'Date of Admission'] = None
+    df.loc[5::89, 'Discharge Date'] = 'not a date'
+    df.to_csv(path, index=False)
+    return path
+
+def test_chunks_match_one_pass(patients_csv, monkeypatch):
+    whole = utils.stream_aggregates(patients_csv, chunk_size=10000)
+    # Chunks of 50 rows merge their partial cubes several times
+    monkeypatch.setattr(utils, 'MERGE_CHUNKS', 4)
+    chunked = utils.stream_aggregates(patients_csv, chunk_size=50)
+
+    pd.testing.assert_frame_equal(chunked['daily_cube'], whole['daily_cube'])
+    pd.testing.assert_frame_equal(chunked['billing_cube'], whole['billing_cube'])
+    for column, cube in whole['breakdown_cubes'].items():
+        pd.testing.assert_frame_equal(chunked['breakdown_cubes'][column], cube)
+    pd.testing.assert_frame_equal(chunked['locations'], whole['locations'])
+    assert chunked['billing_range'] == whole['billing_range']
+    assert chunked['rows'] == whole['rows']
+    assert chunked['load_report']['quarantined'] == whole['load_report']['quarantined']
+
+def test_quarantine_file(patients_csv):
+    aggregates = utils.stream_aggregates(patients_csv, chunk_size=50)
+    counts = aggregates['load_report']['quarantined']
+    assert counts['Invalid admission date'] == 16
+    assert sum(counts.values()) + aggregates['rows'] == 1500
+
+    quarantined = pd.read_csv(utils.quarantine_path(patients_csv))
+    assert utils.quarantine_counts(quarantined) == counts
@@ -1,23 +1,163 @@
 # utils.py
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
+import numpy as np
 from datetime import timedelta
 import base64
+import hashlib
+import json
+import os
+import sys
+import sqlite3
+import tempfile
+import threading
+import time
 
-def load_clusters():
-    url = "data/clustered_patients.csv"
-    df = pd.read_csv(url)
-    
-    df['Date of Admission'] = pd.to_datetime(df['Date of Admission'])
-    df['Discharge Date'] = pd.to_datetime(df['Discharge Date'])
-    df['Length of Stay'] = (df['Discharge Date'] - df['Date of Admission']).dt.days
-    df['Year'] = df['Date of Admission'].dt.year
+# HEALTHCARE_DATA_PATH and HEALTHCARE_CLUSTERS_PATH point the app at another
+# dataset with the same columns, such as the ones benchmark.py generates
+DATA_PATH = os.environ.get('HEALTHCARE_DATA_PATH', "data/Healthcare Analysis Dataset.csv")
+CLUSTERS_PATH = os.environ.get('HEALTHCARE_CLUSTERS_PATH', "data/clustered_patients.csv")
 
-    df.Cluster += 1     # clusters will be 1-6
+# Bump whenever the columns or dtypes written to the columnar cache change,
+# so caches built by an older version of the app are rebuilt
+CACHE_VERSION = 4
 
-    df['Cluster'] = df['Cluster'].apply(lambda x: 'Cluster ' + str(x) )
-    
-    return df
+# Format of 'Date of Admission' and 'Discharge Date' in the CSV files.
+# Declaring it lets pandas parse the whole column in one pass instead of
+# guessing the format; values that do not match are quarantined.
+DATE_FORMAT = os.environ.get('HEALTHCARE_DATE_FORMAT', '%Y-%m-%d')
+
+# Dimension columns are stored as pandas categoricals (integer codes plus a
+# small dictionary). Known values keep the fixed order listed here; values
+# that are not listed are appended in sorted order instead of being dropped.
+# None means the categories are simply the sorted values found in the file.
+CATEGORICAL_SCHEMA = {
+    'Gender': ['Female', 'Male'],
+    'Blood Type': ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-'],
+    'Medical Condition': ['Arthritis', 'Asthma', 'Cancer', 'Diabetes', 'Hypertension', 'Obesity'],
+    'Hospital': None,
+    'Insurance Provider': ['Aetna', 'Blue Cross', 'Cigna', 'Medicare', 'UnitedHealthcare'],
+    'Admission Type': ['Elective', 'Emergency', 'Urgent'],
+    'Medication': ['Aspirin', 'Ibuprofen', 'Lipitor', 'Paracetamol', 'Penicillin'],
+    'Test Results': ['Normal', 'Abnormal', 'Inconclusive']
+}
+
+# Integer columns downcast to the smallest type that holds their values
+SMALL_INT_COLUMNS = ['Age', 'Length of Stay', 'Year', 'Month', 'Quarter']
+
+# Age groupings offered on Patient Demographics, as the lower bound of each
+# group; the last group is open-ended. The first one is stored with the
+# patient table as the 'Age (bins)' column when the dataset is loaded.
+AGE_GROUPINGS = {
+    '10-year bands': [0, 10, 20, 30, 40, 50, 60, 70, 80],
+    '5-year bands': list(range(0, 90, 5)),
+    'Pediatric / Adult / Geriatric': [0, 18, 65]
+}
+DEFAULT_AGE_GROUPING = '10-year bands'
+
+# Billing as float32 halves its memory but rounds sums in the last cents,
+# so it is opt-in: set HEALTHCARE_FLOAT32_BILLING=1 to enable it
+FLOAT32_BILLING = os.environ.get('HEALTHCARE_FLOAT32_BILLING', '0') == '1'
+
+# Dimensions of the daily cube. Each cell holds the patient count and the
+# billing and length-of-stay totals of its rows, so period KPIs are sums
+# over cells instead of scans over patients.
+CUBE_DIMENSIONS = ['Date of Admission', 'Hospital', 'Insurance Provider', 'Admission Type', 'Test Results']
+
+# Dimensions that run to thousands of values in production data (ICD-level
+# conditions, drug codes). For each admission month and hospital a
+# Space-Saving summary monitors at most HEALTHCARE_SKETCH_CAPACITY values,
+# and top-N lists are merged from these summaries instead of counting and
+# sorting all values.
+HEAVY_HITTER_COLUMNS = ['Medical Condition', 'Medication']
+SKETCH_CAPACITY = int(os.environ.get('HEALTHCARE_SKETCH_CAPACITY', '32'))
+
+# Sunburst levels of those dimensions show this many values; the rest are
+# grouped as 'Other'
+SUNBURST_TOP_N = 20
+
+# Opt-in approximate mode: row-level tables are estimated from a sample of
+# HEALTHCARE_SAMPLE_FRACTION of each hospital's admissions in each month,
+# with 95% confidence intervals. Selections with fewer than
+# HEALTHCARE_SAMPLE_MIN_ROWS sampled rows are computed exactly instead. The
+# defaults let a year of all hospitals in the challenge dataset (55,500
+# admissions) use the sample; on tens of millions of rows a smaller fraction
+# gives the same precision.
+SAMPLE_FRACTION = float(os.environ.get('HEALTHCARE_SAMPLE_FRACTION', '0.1'))
+SAMPLE_MIN_ROWS = int(os.environ.get('HEALTHCARE_SAMPLE_MIN_ROWS', '200'))
+CONFIDENCE_Z = 1.96
+APPROXIMATE_PAGES = ['Patient Demographics', 'Insurance & Billing']
+
+# Number of (hospitals, period) filter results kept in the shared cache
+FILTER_CACHE_ENTRIES = int(os.environ.get('HEALTHCARE_FILTER_CACHE_ENTRIES', '64'))
+
+# HEALTHCARE_LOAD_MODE=stream never loads the patient table: the CSV is read
+# HEALTHCARE_CHUNK_SIZE rows at a time and folded into the daily cube, so
+# memory is bounded by one chunk plus the aggregates (see load_aggregates).
+# Charts that need row-level data say so instead of rendering.
+LOAD_MODE = os.environ.get('HEALTHCARE_LOAD_MODE', 'memory')
+CHUNK_SIZE = int(os.environ.get('HEALTHCARE_CHUNK_SIZE', '250000'))
+# Partial cubes of this many chunks are merged at once, so each cell is
+# re-added once per batch rather than once per chunk
+MERGE_CHUNKS = 16
+
+# Session state only holds widget values and small page settings; frames
+# and figures live in the shared caches. HEALTHCARE_SHOW_SESSION_MEMORY=1
+# adds a sidebar table of the bytes each connected session keeps in its
+# session state, to check that it stays that way.
+SHOW_SESSION_MEMORY = os.environ.get('HEALTHCARE_SHOW_SESSION_MEMORY', '0') == '1'
+
+# Sessions not seen for this long are dropped from that table
+SESSION_IDLE_SECONDS = 3600
+
+# HEALTHCARE_PROFILE=1 adds a sidebar table of the time each page section
+# spent computing, building figures and sending them to the browser, and
+# HEALTHCARE_PROFILE_LOG appends the same timings to a JSON lines file
+PROFILE = os.environ.get('HEALTHCARE_PROFILE', '0') == '1'
+PROFILE_LOG = os.environ.get('HEALTHCARE_PROFILE_LOG')
+
+# Engine behind compare_periods: 'pandas' groups the sliced patient table,
+# 'sqlite' keeps a copy of it in an in-process SQLite database and runs the
+# same aggregations as SQL, returning only the grouped result
+QUERY_BACKEND = os.environ.get('HEALTHCARE_QUERY_BACKEND', 'pandas')
+
+# Columns Patient Demographics and Insurance & Billing break down by. In
+# streaming mode each gets a cube of its own, per admission day, hospital
+# and value, and billing one of patients per BILLING_BIN_WIDTH dollars, so
+# those pages are sums over cells as well.
+BREAKDOWN_COLUMNS = ['Gender', 'Age', 'Blood Type', 'Medical Condition']
+BILLING_BIN_WIDTH = 1000
+
+# The only columns the streamed aggregates are built from
+STREAM_COLUMNS = CUBE_DIMENSIONS + BREAKDOWN_COLUMNS + ['Discharge Date', 'Billing Amount', 'Hospital Latitude',
+                                                       'Hospital Longitude']
+LOCATION_COLUMNS = ['Hospital', 'Hospital Latitude', 'Hospital Longitude']
+
+def cluster_labels(df, clusters_version, url=CLUSTERS_PATH):
+    # The segmentation model's label of each row of df as a categorical
+    # Series, matched on Patient ID; patients it did not score get NaN and a
+    # patient listed twice keeps the first label. Only the key and the label
+    # are read: the rest of the file is a copy of the patient table.
+    # clusters_version only keys the cache.
+    clusters = pd.read_csv(url, usecols=['Patient ID', 'Cluster']).dropna().drop_duplicates('Patient ID')
+    numbers = clusters['Cluster'].astype('int64') + 1     # clusters will be 1-6
+    labels = [f'Cluster {n}' for n in np.sort(numbers.unique())]
+    by_patient = pd.Series(pd.Categorical([f'Cluster {n}' for n in numbers], categories=labels),
+                           index=clusters['Patient ID'].to_numpy())
+    return df['Patient ID'].map(by_patient).rename('Cluster')
+
+@st.cache_resource(show_spinner=False)
+def build_cluster_labels(_df, dataset_version, clusters_version):
+    return cluster_labels(_df, clusters_version)
+
+def load_cluster_labels(df):
+    # Joined on first use by the page that shows the clusters, and rejoined
+    # when the clusters file changes. None when there is no clusters file,
+    # which only hides the clustering section.
+    if not os.path.exists(CLUSTERS_PATH):
+        return None
+    return shared_result(build_cluster_labels, cluster_labels, df, file_version(CLUSTERS_PATH))
 
 def img_to_base64(img_path):
     with open(img_path, "rb") as img_file:
@@ -26,13 +166,155 @@ def img_to_base64(img_path):
 def toggle_help_state():
     st.session_state.show_help = False
 
-@st.cache_data
-def load_data():
-    url = "data/Healthcare Analysis Dataset.csv"
+def columnar_cache_paths(csv_path):
+    # The typed cache lives next to the CSV, with a small JSON sidecar
+    # describing the source file it was built from
+    base = os.path.splitext(csv_path)[0]
+    return base + ".parquet", base + ".parquet.json"
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def columnar_cache_is_fresh(csv_path, meta_path):
+    if not os.path.exists(meta_path):
+        return False
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+
+    # A cache parsed with another date format holds other rows (or none)
+    stat = os.stat(csv_path)
+    if meta.get('version') != CACHE_VERSION or meta.get('date_format') != DATE_FORMAT:
+        return False
+    if meta.get('size') != stat.st_size:
+        return False
+    if meta.get('mtime_ns') == stat.st_mtime_ns:
+        return True
+
+    # Same size but a different mtime (copied or touched file): only rebuild
+    # if the content actually changed
+    if meta.get('sha256') != file_sha256(csv_path):
+        return False
+    meta['mtime_ns'] = stat.st_mtime_ns
+    try:
+        with open(meta_path, "w") as f:
+            json.dump(meta, f)
+    except OSError:
+        pass
+    return True
+
+def write_columnar_cache(df, csv_path, load_report=None):
+    parquet_path, meta_path = columnar_cache_paths(csv_path)
+    stat = os.stat(csv_path)
+    meta = {
+        'version': CACHE_VERSION,
+        'date_format': DATE_FORMAT,
+        'source': os.path.basename(csv_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': file_sha256(csv_path),
+        'rows': len(df),
+        # How the CSV was parsed, so loads from the cache can still report it
+        'load_report': load_report
+    }
+    # Write to temporary files of our own and swap them in, so replicas
+    # writing at the same time never share or read a half-written file. The
+    # sidecar goes last: it is what marks the parquet copy as fresh.
+    temp_paths = []
+    try:
+        for path in [parquet_path, meta_path]:
+            handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.',
+                                                 prefix=os.path.basename(path) + '.', suffix='.tmp')
+            os.close(handle)
+            temp_paths.append(temp_path)
+        df.to_parquet(temp_paths[0], index=False)
+        with open(temp_paths[1], "w") as f:
+            json.dump(meta, f)
+        os.replace(temp_paths[0], parquet_path)
+        os.replace(temp_paths[1], meta_path)
+    except (ImportError, OSError):
+        # No parquet engine installed or a read-only data directory:
+        # keep serving straight from the CSV
+        for temp_path in temp_paths:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+def parse_source_csv(url, timings=None):
+    # Returns the valid rows with parsed dates and derived columns, and the
+    # quarantined rows as they were read
+    timings = {} if timings is None else timings
+
+    started = time.perf_counter()
     df = pd.read_csv(url)
+    timings['read_csv'] = time.perf_counter() - started
+
+    df, quarantined = parse_dates(df, timings)
+
+    started = time.perf_counter()
+    df = add_derived_columns(df)
+    timings['derive_columns'] = time.perf_counter() - started
+
+    return df, quarantined
 
-    df['Date of Admission'] = pd.to_datetime(df['Date of Admission'])
-    df['Discharge Date'] = pd.to_datetime(df['Discharge Date'])
+def parse_dates(df, timings=None):
+    # Parses both date columns with DATE_FORMAT and sets aside the rows that
+    # cannot be used: a date that is missing or does not match the format,
+    # or a discharge before the admission. Those would otherwise turn into
+    # NaT or a negative length of stay.
+    timings = {} if timings is None else timings
+
+    started = time.perf_counter()
+    admission = pd.to_datetime(df['Date of Admission'], format=DATE_FORMAT, errors='coerce')
+    discharge = pd.to_datetime(df['Discharge Date'], format=DATE_FORMAT, errors='coerce')
+    timings['parse_dates'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    reason = np.select(
+        [admission.isna().to_numpy(), discharge.isna().to_numpy(), (discharge < admission).to_numpy()],
+        ['Invalid admission date', 'Invalid discharge date', 'Discharge before admission'],
+        default=''
+    )
+    invalid = reason != ''
+
+    quarantined = df[invalid].assign(**{'Quarantine Reason': reason[invalid]})
+    df = df[~invalid].assign(**{
+        'Date of Admission': admission[~invalid],
+        'Discharge Date': discharge[~invalid]
+    })
+    timings['validate_dates'] = time.perf_counter() - started
+
+    return df, quarantined
+
+def quarantine_counts(quarantined):
+    return {str(reason): int(count) for reason, count in quarantined['Quarantine Reason'].value_counts().items()}
+
+def quarantine_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".quarantine.csv"
+
+def add_quarantine_counts(counts, quarantined):
+    # Running counts per reason, most frequent first like quarantine_counts
+    for reason, count in quarantine_counts(quarantined).items():
+        counts[reason] = counts.get(reason, 0) + count
+    return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+def write_quarantine(quarantined, csv_path):
+    # Rejected rows go next to the source file for whoever maintains it
+    path = quarantine_path(csv_path)
+    try:
+        if len(quarantined):
+            quarantined.to_csv(path, index=False)
+        elif os.path.exists(path):
+            os.remove(path)
+    except OSError:
+        pass
+
+def add_derived_columns(df):
     df['Length of Stay'] = (df['Discharge Date'] - df['Date of Admission']).dt.days
     df['Year'] = df['Date of Admission'].dt.year
     df['Month'] = df['Date of Admission'].dt.month
@@ -40,22 +322,1453 @@ def load_data():
 
     return df
 
+def apply_schema(df):
+    categorize(df, CATEGORICAL_SCHEMA)
+
+    for col in SMALL_INT_COLUMNS:
+        if df[col].notna().all():
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+
+    return df
+
+def categorize(df, columns):
+    # Converts the given schema columns of df to categoricals in place
+    for col in columns:
+        categories = CATEGORICAL_SCHEMA[col]
+        observed = sorted(df[col].dropna().unique().tolist())
+        if categories is None:
+            categories = observed
+        else:
+            categories = categories + [value for value in observed if value not in categories]
+        df[col] = pd.Categorical(df[col], categories=categories)
+
+    return df
+
+def sort_by_admission(df):
+    # Keeping the rows in admission-date order turns every period filter
+    # into a binary search (see slice_period)
+    return df.sort_values('Date of Admission', kind='stable', ignore_index=True)
+
+@st.cache_resource(show_spinner=False)
+def dataset_stamps():
+    # Process-wide: dataset version -> (row count, index) of the frame
+    # stamped with it
+    return {}
+
+def stamp_dataset(df, version):
+    # Names df as `version` in the keys of the shared caches
+    df.attrs['dataset_version'] = version
+    dataset_stamps()[version] = (len(df), df.index)
+    return df
+
+def dataset_version_of(df):
+    # The version df was stamped with, or None for any other frame. pandas
+    # copies attrs onto every slice and derived frame, so the stamp only
+    # counts while df still has all the rows of the stamped frame: the same
+    # length and index, as load_data's shallow copies do.
+    version = df.attrs.get('dataset_version')
+    stamp = dataset_stamps().get(version) if version is not None else None
+    if stamp is None or len(df) != stamp[0] or not df.index.equals(stamp[1]):
+        return None
+    return version
+
+def shared_result(cached, plain, df, *args):
+    # cached(df, version, *args) for a stamped frame, shared by all sessions;
+    # any other frame has nothing safe to key the shared caches on and gets
+    # plain(df, *args) instead
+    version = dataset_version_of(df)
+    if version is None:
+        return plain(df, *args)
+    return cached(df, version, *args)
+
+def period_rows(df, start, end, hospitals=None):
+    # df is sorted by admission date, so the rows of a period form one
+    # contiguous block found by two binary searches. A missing start or
+    # end leaves that side open.
+    dates = df['Date of Admission']
+    lo = dates.searchsorted(start, side='left') if start is not None else 0
+    hi = dates.searchsorted(end, side='right') if end is not None else len(df)
+
+    if not hospitals:
+        return slice(lo, hi)
+
+    if dataset_version_of(df) is not None:
+        # Union of the selected hospitals' rows, each cut to the period
+        return hospital_period_rows(load_hospital_index(df), hospitals, lo, hi)
+
+    # Without an index the hospital filter scans the rows inside the period
+    in_hospitals = df['Hospital'].iloc[lo:hi].isin(hospitals).to_numpy()
+    return lo + np.flatnonzero(in_hospitals)
+
+@st.cache_resource(show_spinner=False)
+def build_hospital_index(_df, dataset_version):
+    # The row positions of each hospital, stored back to back: rows of the
+    # hospital with code c are positions[offsets[c]:offsets[c + 1]]. A
+    # stable sort keeps each hospital's rows in date order.
+    codes = _df['Hospital'].cat.codes.to_numpy()
+    positions = np.argsort(codes, kind='stable')
+    counts = np.bincount(codes[codes >= 0], minlength=len(_df['Hospital'].cat.categories))
+    offsets = np.zeros(len(counts) + 1, dtype='int64')
+    np.cumsum(counts, out=offsets[1:])
+
+    # Rows with a missing hospital (code -1) sort first; skip them
+    missing = len(codes) - counts.sum()
+    return {
+        'hospitals': _df['Hospital'].cat.categories,
+        'positions': positions[missing:],
+        'offsets': offsets
+    }
+
+def load_hospital_index(df):
+    # Built once per dataset version and shared read-only by all sessions
+    return build_hospital_index(df, dataset_version_of(df))
+
+def hospital_period_rows(index, hospitals, lo, hi):
+    # Each hospital's positions are sorted, so two binary searches cut them
+    # to [lo, hi). Hospitals are disjoint, so the union is a concatenation
+    # put back in date order; nothing outside the selection is touched.
+    codes = index['hospitals'].get_indexer(list(hospitals))
+    parts = []
+    for code in codes[codes >= 0]:
+        rows = index['positions'][index['offsets'][code]:index['offsets'][code + 1]]
+        parts.append(rows[rows.searchsorted(lo):rows.searchsorted(hi)])
+
+    if not parts:
+        return np.empty(0, dtype='int64')
+    return np.sort(np.concatenate(parts).astype('int64', copy=False))
+
+def slice_period(df, start, end, hospitals=None):
+    # Without a hospital filter this is a plain iloc slice and copies nothing
+    return df.iloc[period_rows(df, start, end, hospitals)]
+
+def period_indexers(df, hospitals, current_start, current_end, prev_start, prev_end):
+    current_rows = period_rows(df, current_start, current_end, hospitals)
+
+    if prev_start is not None and prev_end is not None:
+        prev_rows = period_rows(df, prev_start, prev_end, hospitals)
+    else:
+        prev_rows = None
+
+    return current_rows, prev_rows
+
+@st.cache_resource(max_entries=FILTER_CACHE_ENTRIES, show_spinner=False)
+def cached_period_indexers(_df, dataset_version, hospitals, current_start, current_end, prev_start, prev_end):
+    # Row indexers (slices or position arrays) are shared by every session
+    # and page as the same objects, so a hit never copies a position array;
+    # they are made read-only for that. The least recently used filter
+    # combinations are evicted first.
+    indexers = period_indexers(_df, hospitals, current_start, current_end, prev_start, prev_end)
+    for rows in indexers:
+        if isinstance(rows, np.ndarray):
+            rows.flags.writeable = False
+    return indexers
+
+def slice_periods(df, current_start, current_end, prev_start, prev_end, hospitals=None):
+    # The selection order of the multiselect does not change the result
+    hospitals = tuple(sorted(hospitals)) if hospitals else ()
+    current_rows, prev_rows = shared_result(
+        cached_period_indexers, period_indexers, df, hospitals, current_start, current_end, prev_start, prev_end
+    )
+
+    df_current = df.iloc[current_rows]
+    df_prev = df.iloc[prev_rows] if prev_rows is not None else None
+
+    return df_current, df_prev
+
+def aggregate_cube(df, dimensions):
+    measures = pd.DataFrame({
+        'Billing': df['Billing Amount'].astype('float64'),
+        'Stay': df['Length of Stay'].astype('float64')
+    })
+    # dropna=False keeps rows with a missing dimension in a cell of their own,
+    # so the cube totals always match the patient table
+    return measures.groupby([df[col] for col in dimensions], observed=True, dropna=False).agg(
+        Patient_Count=('Billing', 'size'),
+        Total_Billing=('Billing', 'sum'),
+        Billing_Count=('Billing', 'count'),
+        Total_Stay=('Stay', 'sum'),
+        Stay_Count=('Stay', 'count')
+    ).reset_index()
+
+def aggregate_daily_cube(df):
+    return aggregate_cube(df, CUBE_DIMENSIONS)
+
+def merge_cubes(cubes, dimensions=CUBE_DIMENSIONS):
+    # Cells are plain sums, so partial cubes combine by adding matching cells
+    return pd.concat(cubes, ignore_index=True).groupby(
+        dimensions, observed=True, dropna=False
+    ).sum().reset_index()
+
+@st.cache_resource(show_spinner=False)
+def build_daily_cube(_df, dataset_version):
+    cube = aggregate_daily_cube(_df)
+
+    # Grouping sorts by date first, so the cube can be sliced with
+    # slice_periods like the patient table. It gets its own version so its
+    # cached row indexers never mix with the patient table's.
+    return stamp_dataset(cube, f"{dataset_version}-daily-cube")
+
+def load_daily_cube(df):
+    # Built once per dataset version and shared read-only by all sessions.
+    # Without a patient table (streaming mode) the streamed cube is used.
+    if df is None:
+        return load_aggregates()['daily_cube']
+    return shared_result(build_daily_cube, aggregate_daily_cube, df)
+
+def make_catalog(df, locations, billing_range=None):
+    # Metadata widgets and labels need, computed in one pass over df (the
+    # patient table or the daily cube):
+    #   dimensions: the values of each dimension that occur, in category order
+    #   cardinality: how many there are
+    #   min_date / max_date: first and last admission
+    #   last_complete_month_end: max_date, or the end of the previous month
+    #     when max_date is early in its month (before the 25th)
+    #   hospital_locations: one latitude/longitude per hospital
+    #   billing_range: lowest and highest billing amount (read from df
+    #     unless given)
+    dimensions = {}
+    for col in CATEGORICAL_SCHEMA:
+        if col in df.columns:
+            codes = df[col].cat.codes.to_numpy()
+            counts = np.bincount(codes[codes >= 0], minlength=len(df[col].cat.categories))
+            dimensions[col] = df[col].cat.categories[counts > 0].tolist()
+
+    dates = df['Date of Admission']
+    min_date, max_date = dates.min(), dates.max()
+    if max_date.day < 25:
+        last_complete_month_end = max_date.normalize().replace(day=1) - timedelta(days=1)
+    else:
+        last_complete_month_end = max_date
+    if billing_range is None:
+        billing_range = (df['Billing Amount'].min(), df['Billing Amount'].max())
+
+    return {
+        'dimensions': dimensions,
+        'cardinality': {col: len(values) for col, values in dimensions.items()},
+        'min_date': min_date,
+        'max_date': max_date,
+        'last_complete_month_end': last_complete_month_end,
+        'hospital_locations': locations.sort_values('Hospital', ignore_index=True),
+        'billing_range': tuple(float(value) for value in billing_range)
+    }
+
+def table_catalog(df):
+    return make_catalog(df, df[LOCATION_COLUMNS].drop_duplicates('Hospital'))
+
+@st.cache_resource(show_spinner=False)
+def build_catalog(_df, dataset_version):
+    return table_catalog(_df)
+
+def load_catalog(df):
+    # Built once per dataset version and shared read-only by all sessions.
+    # In streaming mode it comes with the aggregates.
+    if df is None:
+        return load_aggregates()['catalog']
+    return shared_result(build_catalog, table_catalog, df)
+
+def cube_monthly_counts(cube_rows):
+    # Patients per calendar month, as month-start timestamps
+    months = cube_rows['Date of Admission'].dt.to_period('M').rename('month_year')
+    monthly = cube_rows.groupby(months)['Patient_Count'].sum().reset_index()
+    monthly['month_year'] = monthly['month_year'].dt.to_timestamp()
+    return monthly
+
+def safe_mean(total, count):
+    return total / count if count > 0 else float('nan')
+
+def cube_share(cube_rows, column, value):
+    # Percentage of the patients in cube_rows whose `column` equals `value`
+    total = cube_rows['Patient_Count'].sum()
+    matching = cube_rows.loc[cube_rows[column] == value, 'Patient_Count'].sum()
+    return matching / total * 100 if total > 0 else 0
+
+def cube_counts(cube_rows, column):
+    # Patients per value of `column`, largest first (like value_counts)
+    counts = cube_rows.groupby(column, observed=True)['Patient_Count'].sum()
+    return counts[counts > 0].sort_values(ascending=False, kind='stable')
+
+# Measures kept as per-hospital running totals over calendar days
+PREFIX_MEASURES = ['Patient_Count', 'Total_Billing', 'Billing_Count', 'Total_Stay', 'Stay_Count']
+
+def prefix_sums(cube):
+    # Built from the daily cube rather than the patient table, so it works
+    # the same whether or not the rows are in memory
+    dates = cube['Date of Admission']
+    first_day = dates.min().normalize()
+    n_days = (dates.max().normalize() - first_day).days + 1
+    hospitals = cube['Hospital'].cat.categories
+    n_hospitals = len(hospitals)
+
+    # One flat (hospital, day) cell number per cube cell; cells of a missing
+    # hospital have code -1 and are left out like groupby does
+    codes = cube['Hospital'].cat.codes.to_numpy()
+    valid = dates.notna().to_numpy() & (codes >= 0)
+    day = ((dates[valid].dt.normalize() - first_day).dt.days).to_numpy()
+    cell = codes[valid].astype('int64') * n_days + day
+
+    # sums[m][h, d] is the total of measure m for hospital h over the days
+    # before d, so any day range is the difference of two columns
+    sums = {}
+    for measure in PREFIX_MEASURES:
+        values = cube[measure].to_numpy()[valid]
+        daily = np.bincount(cell, weights=values, minlength=n_hospitals * n_days)
+        if measure not in ('Total_Billing', 'Total_Stay'):
+            # bincount weights are floats; counts go back to integers
+            daily = daily.round().astype('int64')
+        running = np.zeros((n_hospitals, n_days + 1), dtype=daily.dtype)
+        np.cumsum(daily.reshape(n_hospitals, n_days), axis=1, out=running[:, 1:])
+        sums[measure] = running
+
+    return {'first_day': first_day, 'n_days': n_days, 'hospitals': hospitals, 'sums': sums}
+
+@st.cache_resource(show_spinner=False)
+def build_prefix_sums(_cube, dataset_version):
+    return prefix_sums(_cube)
+
+def load_prefix_sums(df):
+    # Built once per dataset version and shared read-only by all sessions
+    return shared_result(build_prefix_sums, prefix_sums, load_daily_cube(df))
+
+def range_totals(prefix, start, end, hospitals=None):
+    # Per-hospital totals of every prefix measure over [start, end]: two
+    # array lookups per hospital, whatever the length of the range.
+    # Hospitals without patients in the range are left out, like groupby.
+    n_days = prefix['n_days']
+    lo = 0 if start is None else min(max((start - prefix['first_day']).days, 0), n_days)
+    hi = n_days if end is None else min(max((end - prefix['first_day']).days + 1, 0), n_days)
+    hi = max(hi, lo)
+
+    all_hospitals = prefix['hospitals']
+    if hospitals:
+        rows = np.flatnonzero(all_hospitals.isin(hospitals))
+    else:
+        rows = np.arange(len(all_hospitals))
+
+    totals = pd.DataFrame({'Hospital': pd.Categorical(all_hospitals[rows], categories=all_hospitals)})
+    for measure, running in prefix['sums'].items():
+        totals[measure] = running[rows, hi] - running[rows, lo]
+
+    return totals[totals['Patient_Count'] > 0].reset_index(drop=True)
+
+def range_total(prefix, start, end, hospitals=None):
+    # The same totals summed over the selected hospitals
+    totals = range_totals(prefix, start, end, hospitals)
+    return {measure: totals[measure].sum() for measure in PREFIX_MEASURES}
+
+# SQL for the aggregations compare_periods understands. TOTAL is SQLite's
+# SUM that returns 0 instead of NULL when there is nothing to add, like pandas.
+SQL_AGGREGATES = {
+    'size': 'COUNT(*)',
+    'count': 'COUNT({column})',
+    'sum': 'TOTAL({column})',
+    'mean': 'AVG({column})'
+}
+
+def sql_name(column):
+    return '"' + column.replace('"', '""') + '"'
+
+@st.cache_resource(show_spinner=False)
+def build_sql_backend(_df, dataset_version):
+    # One in-memory database per dataset version, shared by all sessions.
+    # Admission dates are stored as epoch nanoseconds so period predicates
+    # compare exactly like the binary search on the patient table does.
+    table = _df.drop(columns=['Date of Admission', 'Discharge Date'])
+    admissions = _df['Date of Admission'].dt.as_unit('ns')
+    table['admission_ns'] = pd.arrays.IntegerArray(
+        admissions.to_numpy().view('int64'), admissions.isna().to_numpy()
+    )
+
+    connection = sqlite3.connect(':memory:', check_same_thread=False)
+    table.to_sql('patients', connection, index=False)
+    connection.execute('CREATE INDEX patients_period ON patients (admission_ns, "Hospital")')
+    connection.commit()
+
+    # Script runs are threads; a sqlite connection serves one at a time
+    return {'connection': connection, 'lock': threading.Lock()}
+
+def sql_measure(name, measure, params):
+    # SELECT expression of one measure; a measure may carry a condition
+    # (column, value) that limits it to the matching rows
+    column, func = measure[0], measure[1]
+    expression = sql_name(column)
+    if len(measure) > 2:
+        condition_column, condition_value = measure[2]
+        expression = f'CASE WHEN {sql_name(condition_column)} = ? THEN {expression} END'
+        params.append(condition_value)
+    return SQL_AGGREGATES[func].format(column=expression) + ' AS ' + sql_name(name)
+
+def sql_select(start, end, hospitals, by, measures, label=None):
+    # One grouped SELECT over a period. Date range and hospitals are pushed
+    # down as WHERE predicates; rows with a missing group value are left
+    # out, like groupby does. `label` adds a constant Period column.
+    params = []
+    select = [sql_name(col) for col in by]
+    if label is not None:
+        select.append(f"'{label}' AS \"Period\"")
+    select += [sql_measure(name, measure, params) for name, measure in measures.items()]
+
+    where = []
+    if start is not None:
+        where.append('admission_ns >= ?')
+        params.append(pd.Timestamp(start).value)
+    if end is not None:
+        where.append('admission_ns <= ?')
+        params.append(pd.Timestamp(end).value)
+    if hospitals:
+        where.append('"Hospital" IN (' + ', '.join('?' * len(hospitals)) + ')')
+        params.extend(hospitals)
+    where.extend(f'{sql_name(col)} IS NOT NULL' for col in by)
+
+    query = 'SELECT ' + ', '.join(select) + ' FROM patients'
+    if where:
+        query += ' WHERE ' + ' AND '.join(where)
+    if by:
+        query += ' GROUP BY ' + ', '.join(sql_name(col) for col in by)
+    return query, params
+
+def sql_query(df, query, params, by, measures):
+    backend = build_sql_backend(df, dataset_version_of(df))
+    with backend['lock']:
+        result = pd.read_sql_query(query, backend['connection'], params=params)
+
+    # An AVG over no rows comes back as None; make it NaN like pandas
+    for name in measures:
+        result[name] = pd.to_numeric(result[name])
+
+    # Give the group columns the dtypes and order of the pandas result
+    for col in by:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            result[col] = pd.Categorical(result[col], categories=df[col].cat.categories)
+        else:
+            result[col] = result[col].astype(df[col].dtype)
+    if by:
+        result = result.sort_values(by, kind='stable', ignore_index=True)
+
+    return result
+
+def pandas_measure_frame(rows, by, measures):
+    # The group columns plus one value column per measure, with values of
+    # conditional measures blanked outside their condition
+    frame = pd.DataFrame({col: rows[col] for col in by})
+    aggregations = {}
+    for name, measure in measures.items():
+        column, func = measure[0], measure[1]
+        values = rows[column]
+        if len(measure) > 2:
+            condition_column, condition_value = measure[2]
+            values = values.where(rows[condition_column] == condition_value)
+        frame['_' + name] = values
+        aggregations[name] = ('_' + name, func)
+    return frame, aggregations
+
+def restore_integer_measures(result, rows, measures):
+    # Blanking turns integer columns into floats; sums and counts of
+    # integers go back to integers
+    for name, measure in measures.items():
+        if measure[1] in ('sum', 'count', 'size') and pd.api.types.is_integer_dtype(rows[measure[0]].dtype):
+            result[name] = result[name].astype('int64')
+    return result
+
+def measure_columns(by, measures):
+    # The columns pandas_measure_frame reads
+    columns = list(by)
+    for measure in measures.values():
+        columns.append(measure[0])
+        if len(measure) > 2:
+            columns.append(measure[2][0])
+    return list(dict.fromkeys(columns))
+
+def pandas_grouped_periods(df, by, measures, periods, hospitals):
+    # Gathers the rows of every period once, tags them with a Period label
+    # and aggregates all periods in a single groupby. Only the columns the
+    # measures read are gathered, and the label is a categorical with one
+    # byte per row.
+    positions = []
+    for start, end in periods.values():
+        rows = period_rows(df, start, end, hospitals)
+        if isinstance(rows, slice):
+            rows = np.arange(rows.start, rows.stop)
+        positions.append(rows)
+
+    rows = df[measure_columns(by, measures)].iloc[np.concatenate(positions)]
+    frame, aggregations = pandas_measure_frame(rows, by, measures)
+    codes = np.repeat(np.arange(len(periods), dtype='int8'), [len(rows) for rows in positions])
+    frame['Period'] = pd.Categorical.from_codes(codes, categories=list(periods))
+    result = frame.groupby(by + ['Period'], observed=True).agg(**aggregations).reset_index()
+    return restore_integer_measures(result, rows, measures)
+
+def sql_grouped_periods(df, by, measures, periods, hospitals):
+    # Both periods in one statement; each SELECT uses the period index
+    queries, params = [], []
+    for label, (start, end) in periods.items():
+        query, query_params = sql_select(start, end, hospitals, by, measures, label)
+        queries.append(query)
+        params.extend(query_params)
+    return sql_query(df, ' UNION ALL '.join(queries), params, by, measures)
+
+def compare_tables(current, prev, by, how='inner', ratios=None):
+    # Joins per-group measures of the current and previous period on `by`
+    # and adds the changes. Every other column is a measure m, which
+    # becomes m_current, m_prev, m_delta and m_change_pct; `ratios` adds
+    # measures computed as {name: (numerator, denominator)} from them.
+    #   how: 'inner' keeps groups with rows in both periods, 'left' those
+    #        in the current period and 'outer' those in either
+    # A group missing from a period has NaN measures there, and a previous
+    # value of 0 or NaN gives a NaN change. Without a previous period (prev
+    # None) the _prev and change columns are NaN.
+    names = [col for col in current.columns if col not in by]
+    if prev is None:
+        prev, how = current.iloc[:0], 'left'
+
+    comparison = pd.merge(
+        current.assign(_in=True), prev.assign(_in=True),
+        on=by, how='outer', sort=True, suffixes=('_current', '_prev')
+    )
+    if how == 'inner':
+        keep = comparison['_in_current'].notna() & comparison['_in_prev'].notna()
+    elif how == 'left':
+        keep = comparison['_in_current'].notna()
+    else:
+        keep = comparison['_in_current'].notna() | comparison['_in_prev'].notna()
+    comparison = comparison[keep].reset_index(drop=True)
+
+    # The outer join made integer measures float; give them back their
+    # dtype where no group is missing
+    for name in names:
+        for period, table in [('current', current), ('prev', prev)]:
+            column = f'{name}_{period}'
+            if pd.api.types.is_integer_dtype(table[name].dtype) and comparison[column].notna().all():
+                comparison[column] = comparison[column].astype(table[name].dtype)
+
+    for name, (numerator, denominator) in (ratios or {}).items():
+        for period in ['current', 'prev']:
+            denominators = comparison[f'{denominator}_{period}']
+            comparison[f'{name}_{period}'] = comparison[f'{numerator}_{period}'] / denominators.where(denominators != 0)
+        names.append(name)
+
+    for name in names:
+        current_values, prev_values = comparison[f'{name}_current'], comparison[f'{name}_prev']
+        comparison[f'{name}_delta'] = current_values - prev_values
+        comparison[f'{name}_change_pct'] = (current_values / prev_values.where(prev_values != 0) - 1) * 100
+
+    return comparison[by + [f'{name}_{suffix}' for name in names for suffix in ['current', 'prev', 'delta', 'change_pct']]]
+
+def period_comparison(df, by, measures, ratios, current_start, current_end, prev_start, prev_end, hospitals, how, backend):
+    by, measures, ratios = list(by), dict(measures), dict(ratios)
+    periods = {'current': (current_start, current_end)}
+    if prev_start is not None and prev_end is not None:
+        periods['prev'] = (prev_start, prev_end)
+
+    if backend == 'sqlite':
+        grouped = sql_grouped_periods(df, by, measures, periods, hospitals)
+    else:
+        grouped = pandas_grouped_periods(df, by, measures, periods, hospitals)
+
+    # Split the single grouped result back into its periods
+    tables = {
+        period: grouped[grouped['Period'] == period].drop(columns='Period')
+        for period in ['current', 'prev']
+    }
+    prev = tables['prev'] if 'prev' in periods else None
+    return compare_tables(tables['current'], prev, by, how, ratios)
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES, show_spinner=False)
+def cached_period_comparison(_df, dataset_version, by, measures, ratios, current_start, current_end, prev_start, prev_end, hospitals, how, backend):
+    # Comparison tables are small, so every session and page shares them
+    return period_comparison(_df, by, measures, ratios, current_start, current_end,
+                             prev_start, prev_end, hospitals, how, backend)
+
+def compare_periods(df, by, current_start, current_end, prev_start, prev_end, hospitals=None,
+                    how='inner', ratios=None, backend=None, **measures):
+    # Compares the current and previous period per group of `by`, with
+    # both periods aggregated in one grouped pass over a Period label.
+    # Measures are named like groupby.agg: Patient_Count=('Patient ID',
+    # 'count'); a third item (column, value) restricts a measure to the rows
+    # where column == value. The result is laid out by compare_tables.
+    # Works on the patient table and on the daily cube.
+    hospitals = tuple(sorted(hospitals)) if hospitals else ()
+    # The SQL copy only holds a stamped patient table; the cube is always pandas
+    backend = backend or QUERY_BACKEND
+    if 'Patient ID' not in df.columns or dataset_version_of(df) is None:
+        backend = 'pandas'
+    return shared_result(
+        cached_period_comparison, period_comparison, df, tuple(by), tuple(measures.items()),
+        tuple((ratios or {}).items()), current_start, current_end, prev_start, prev_end, hospitals, how, backend
+    )
+
+# Patients and stay per dimension value, the measures of dimension_breakdown
+BREAKDOWN_MEASURES = {
+    'Patients': ('Patient ID', 'count'),
+    'Total_Stay': ('Length of Stay', 'sum'),
+    'Stay_Count': ('Length of Stay', 'count')
+}
+
+# The same measures summed from a breakdown cube (streaming mode)
+CUBE_BREAKDOWN_MEASURES = {
+    'Patients': ('Patient_Count', 'sum'),
+    'Total_Stay': ('Total_Stay', 'sum'),
+    'Stay_Count': ('Stay_Count', 'sum')
+}
+
+def bin_labels(bounds):
+    # '0-9', '10-19', ..., '80+' for the lower bounds 0, 10, ..., 80
+    labels = [f'{lower}-{upper - 1}' if upper - 1 > lower else f'{lower}'
+              for lower, upper in zip(bounds[:-1], bounds[1:])]
+    return labels + [f'{bounds[-1]}+']
+
+def bin_codes(values, bounds):
+    # Group index of each value for the sorted lower bounds, -1 below the
+    # first bound or for NaN
+    values = np.asarray(values, dtype='float64')
+    codes = np.digitize(values, bounds) - 1
+    codes[np.isnan(values)] = -1
+    return codes
+
+def bin_values(values, bounds):
+    # Values as an ordered categorical of their groups
+    return pd.Categorical.from_codes(bin_codes(values, bounds), categories=bin_labels(bounds), ordered=True)
+
+def parse_bounds(text):
+    # '0, 18, 65' -> [0, 18, 65]; None unless it is a list of whole
+    # numbers of 0 or more
+    try:
+        bounds = sorted({int(value) for value in text.replace(';', ',').split(',') if value.strip()})
+    except ValueError:
+        return None
+    if not bounds or bounds[0] < 0:
+        return None
+    return bounds
+
+def bin_breakdown(comparison, column, period, bounds):
+    # Sums one period's measures per value of a numeric column into the
+    # groups starting at `bounds`. The values are the few sorted distinct
+    # values of the breakdown, so this never touches the patient rows.
+    codes = bin_codes(comparison[column], bounds)
+    kept = codes >= 0
+    binned = pd.DataFrame({f'{column} (bins)': pd.Categorical.from_codes(
+        np.arange(len(bounds)), categories=bin_labels(bounds), ordered=True
+    )})
+    for name in BREAKDOWN_MEASURES:
+        values = comparison[f'{name}_{period}'].to_numpy(dtype='float64')
+        binned[name] = np.bincount(codes[kept], weights=values[kept], minlength=len(bounds))
+    binned = binned[binned['Patients'] > 0].reset_index(drop=True)
+    return binned.astype({'Patients': 'int64', 'Stay_Count': 'int64'})
+
+def dimension_breakdown(df, column, current_start, current_end, prev_start, prev_end, hospitals=None, bins=None,
+                        sampled=False):
+    # Patients and average stay per value of `column` in the current
+    # period, with the previous period's patients, from one grouped pass
+    # over both periods (cached per filter by compare_periods). Values
+    # without patients in the current period are left out. The result is
+    # laid out by compare_tables: Patients_current, Patients_prev,
+    # Patients_change_pct, Avg_Stay_current, ...
+    # With `bins`, a list of lower bounds, a numeric column is grouped per
+    # value first and the values are summed into the groups starting at
+    # each bound (see bin_labels), returned as the column '<column> (bins)'.
+    # With `sampled` the figures are estimated from the sample, with the
+    # interval columns of compare_periods_sampled. In streaming mode (df
+    # None) they are summed from the column's breakdown cube.
+    measures = BREAKDOWN_MEASURES
+    if df is None:
+        df, measures = load_breakdown_cube(column), CUBE_BREAKDOWN_MEASURES
+    elif sampled:
+        return compare_periods_sampled(df, [column], 'Length of Stay', 'Avg_Stay', current_start, current_end,
+                                       prev_start, prev_end, hospitals, bins)
+
+    ratios = {'Avg_Stay': ('Total_Stay', 'Stay_Count')}
+    if bins is None:
+        return compare_periods(df, [column], current_start, current_end, prev_start, prev_end, hospitals,
+                               how='left', ratios=ratios, **measures)
+
+    # Per value, a previous-period value may be missing from the current one
+    comparison = compare_periods(df, [column], current_start, current_end, prev_start, prev_end, hospitals,
+                                 how='outer', **measures).fillna({
+                                     f'{m}_{period}': 0 for m in BREAKDOWN_MEASURES for period in ['current', 'prev']
+                                 })
+    current = bin_breakdown(comparison, column, 'current', bins)
+    prev = bin_breakdown(comparison, column, 'prev', bins) if prev_start is not None and prev_end is not None else None
+    return compare_tables(current, prev, [f'{column} (bins)'], how='left', ratios=ratios)
+
+def load_breakdown_cube(column):
+    # Streaming mode only: patients, stay and billing per admission day,
+    # hospital and value of a BREAKDOWN_COLUMNS column
+    return load_aggregates()['breakdown_cubes'][column]
+
+def billing_edges(catalog, bins=12):
+    # At most `bins` equal bins over the billing range of the whole dataset,
+    # so a histogram keeps its bins across periods, hospitals and modes. The
+    # edges are multiples of BILLING_BIN_WIDTH, so the streamed per-bin
+    # counts add up to them exactly. Rounding the width up can leave fewer
+    # bins than asked for; the last one always reaches the highest bill.
+    low, high = catalog['billing_range']
+    if not np.isfinite(low):
+        low, high = 0.0, 0.0
+    low = np.floor(low / BILLING_BIN_WIDTH) * BILLING_BIN_WIDTH
+    width = max(np.ceil((high - low) / bins / BILLING_BIN_WIDTH), 1) * BILLING_BIN_WIDTH
+    bins = max(int(np.ceil((high - low) / width)), 1)
+    return low + width * np.arange(bins + 1)
+
+def billing_histogram(df, start, end, hospitals, edges):
+    # Patients admitted in [start, end] per bin of `edges`: counted from
+    # the rows, or in streaming mode (df None) summed from the billing cube
+    if df is not None:
+        values = df['Billing Amount'].iloc[period_rows(df, start, end, hospitals)]
+        return np.histogram(values.to_numpy(dtype='float64'), bins=edges)[0]
+
+    cube = load_aggregates()['billing_cube']
+    cells = cube.iloc[period_rows(cube, start, end, hospitals)]
+    lower = cells['Billing Bin'].to_numpy() * BILLING_BIN_WIDTH
+    bins = np.clip((lower - edges[0]) // (edges[1] - edges[0]), 0, len(edges) - 2).astype('int64')
+    counts = np.bincount(bins, weights=cells['Patient_Count'].to_numpy(), minlength=len(edges) - 1)
+    return counts.round().astype('int64')
+
+SUMMARY_KEYS = ['Month', 'Hospital']
+
+def prune_summaries(entries, column, capacity):
+    # Space-Saving eviction: each (month, hospital) summary keeps the
+    # `capacity` values with the largest counts. Ties keep the larger
+    # guaranteed count (Count - Error), then go by a hash of the value, so
+    # no value is dropped for its place in the alphabet. A summary's Floor,
+    # the most any value it does not monitor can have, rises to the largest
+    # count it evicts.
+    codes = entries[column].cat.codes.to_numpy().astype('int64')
+    entries = entries.assign(Guaranteed=entries['Count'] - entries['Error'],
+                             Hash=codes * 2654435761 % 2**32)
+    entries = entries.sort_values(SUMMARY_KEYS + ['Count', 'Guaranteed', 'Hash'],
+                                  ascending=[True, True, False, False, True], kind='stable', ignore_index=True)
+    cells = [entries[key] for key in SUMMARY_KEYS]
+    rank = entries.groupby(cells, observed=True, dropna=False, sort=False).cumcount().to_numpy()
+    evicted = entries['Count'].where(rank >= capacity, 0)
+    evicted = evicted.groupby(cells, observed=True, dropna=False, sort=False).transform('max')
+    entries['Floor'] = np.maximum(entries['Floor'], evicted)
+    return entries[rank < capacity].drop(columns=['Guaranteed', 'Hash']).reset_index(drop=True)
+
+def heavy_hitter_summary(rows, column, capacity):
+    # Exact counts per admission month, hospital and value, pruned to
+    # `capacity` values per month and hospital
+    dates = rows['Date of Admission']
+    months = pd.Series(dates.to_numpy().astype('datetime64[M]').astype(dates.dtype), index=rows.index, name='Month')
+    entries = rows.groupby([months, rows['Hospital'], rows[column]], observed=True, dropna=False).size()
+    entries = entries.rename('Count').reset_index()
+    entries = entries[entries[column].notna()]
+    entries = entries.assign(Error=np.int64(0), Floor=np.int64(0))
+    return prune_summaries(entries, column, capacity)
+
+def merge_summaries(summaries, column, capacity):
+    # Merges the summaries of the same months and hospitals (from different
+    # chunks). A value's count is the sum over the summaries of its count
+    # where it is monitored and the summary's floor where it is not, and its
+    # guaranteed count the sum of Count - Error where it is monitored, so
+    # the true count stays in [Count - Error, Count]. Floors add up.
+    entries = pd.concat(summaries, ignore_index=True)
+    floors = pd.concat([summary.drop_duplicates(SUMMARY_KEYS) for summary in summaries], ignore_index=True)
+    floors = floors.groupby(SUMMARY_KEYS, observed=True, dropna=False)['Floor'].sum().reset_index()
+
+    entries = entries.assign(Excess=entries['Count'] - entries['Floor'], Guaranteed=entries['Count'] - entries['Error'])
+    entries = entries.groupby(SUMMARY_KEYS + [column], observed=True, dropna=False)[['Excess', 'Guaranteed']].sum()
+    entries = entries.reset_index().merge(floors, on=SUMMARY_KEYS)
+    entries['Count'] = entries['Floor'] + entries['Excess']
+    entries['Error'] = entries['Count'] - entries['Guaranteed']
+    entries = entries[SUMMARY_KEYS + [column, 'Count', 'Error', 'Floor']]
+    return prune_summaries(entries, column, capacity)
+
+def heavy_hitter_sketches(df, capacity=SKETCH_CAPACITY):
+    # {column: summaries}, one frame of Month, Hospital, value, Count, Error
+    # and the summary's Floor, sorted by month so a period is a binary
+    # search. Built chunk by chunk, so the grouping never holds more than
+    # one chunk's counts.
+    sketches = {}
+    for column in HEAVY_HITTER_COLUMNS:
+        summaries = [heavy_hitter_summary(df.iloc[start:start + CHUNK_SIZE], column, capacity)
+                     for start in range(0, len(df), CHUNK_SIZE)]
+        sketches[column] = merge_summaries(summaries, column, capacity)
+    return sketches
+
+@st.cache_resource(show_spinner=False)
+def build_heavy_hitters(_df, dataset_version):
+    return heavy_hitter_sketches(_df)
+
+def whole_months(start, end):
+    # [first, stop): the month starts of the calendar months that lie
+    # entirely inside [start, end]; None leaves that side open
+    first = stop = None
+    if start is not None:
+        month = pd.Timestamp(start).to_period('M')
+        first = month.start_time if pd.Timestamp(start) <= month.start_time else (month + 1).start_time
+    if end is not None:
+        month = pd.Timestamp(end).to_period('M')
+        stop = (month + 1).start_time if pd.Timestamp(end) >= month.end_time.normalize() else month.start_time
+    return first, stop
+
+def period_top_values(df, column, start, end, hospitals, n):
+    summaries = shared_result(build_heavy_hitters, heavy_hitter_sketches, df)[column]
+    categories = summaries[column].cat.categories
+    first, stop = whole_months(start, end)
+
+    # The whole months come from the summaries, the days of the partial
+    # months at either edge are counted exactly from the rows
+    if first is not None and stop is not None and first >= stop:
+        edges, first, stop = [(start, end)], None, None
+        summaries = summaries.iloc[:0]
+    else:
+        edges = []
+        if start is not None and start < first:
+            edges.append((start, first - timedelta(days=1)))
+        if end is not None and stop <= end:
+            edges.append((stop, end))
+        months = summaries['Month']
+        lo = months.searchsorted(first, side='left') if first is not None else 0
+        hi = months.searchsorted(stop, side='left') if stop is not None else len(summaries)
+        summaries = summaries.iloc[lo:hi]
+    if hospitals:
+        summaries = summaries[summaries['Hospital'].isin(hospitals)]
+
+    # Upper bound per category code: the summed floors of all summaries,
+    # plus the excess over its floor wherever a value is monitored
+    codes = summaries[column].cat.codes.to_numpy()
+    floor = summaries.drop_duplicates(SUMMARY_KEYS)['Floor'].sum()
+    upper = floor + np.bincount(codes, weights=summaries['Count'] - summaries['Floor'], minlength=len(categories))
+    lower = np.bincount(codes, weights=summaries['Count'] - summaries['Error'], minlength=len(categories))
+    monitored = np.bincount(codes, minlength=len(categories)) > 0
+    for edge_start, edge_end in edges:
+        values = df[column].iloc[period_rows(df, edge_start, edge_end, hospitals)]
+        exact = np.bincount(values.cat.codes.to_numpy()[values.notna().to_numpy()], minlength=len(categories))
+        upper, lower, monitored = upper + exact, lower + exact, monitored | (exact > 0)
+
+    # Most frequent first; ties go to the larger guaranteed count
+    candidates = np.flatnonzero(monitored)
+    if len(candidates) > n:
+        candidates = candidates[np.argpartition(-upper[candidates], n - 1)[:n]]
+    candidates = candidates[np.lexsort((candidates, -lower[candidates], -upper[candidates]))]
+
+    return pd.DataFrame({
+        column: pd.Categorical.from_codes(candidates, dtype=summaries[column].dtype),
+        'Count': upper[candidates].astype('int64'),
+        'Error': (upper[candidates] - lower[candidates]).astype('int64')
+    })
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES, show_spinner=False)
+def cached_top_values(_df, dataset_version, column, start, end, hospitals, n):
+    return period_top_values(_df, column, start, end, hospitals, n)
+
+def top_values(df, column, start, end, hospitals=None, n=10):
+    # The n most frequent values of a HEAVY_HITTER_COLUMNS column among the
+    # rows admitted in [start, end] (and in `hospitals`), most frequent
+    # first. Whole months are merged from the per-month and hospital
+    # Space-Saving summaries and the partial months at the edges are
+    # counted exactly. Count is an upper bound of the true count and
+    # Count - Error a lower bound; with Error 0 the count is exact.
+    hospitals = tuple(sorted(hospitals)) if hospitals else ()
+    return shared_result(cached_top_values, period_top_values, df, column, start, end, hospitals, n)
+
+def group_other(values, kept):
+    # Categorical values outside `kept` become 'Other'
+    if 'Other' not in values.cat.categories:
+        values = values.cat.add_categories(['Other'])
+    return values.where(values.isin(kept) | values.isna(), 'Other')
+
+def build_hierarchy_cubes(df, paths, start, end, hospitals, age_bounds):
+    # Patients and billing per node path of every sunburst hierarchy in
+    # `paths`. The period's rows are grouped once by all the columns of all
+    # paths (keeping missing values), and each path is a regroup of that
+    # small aggregate.
+    rows, _ = slice_periods(df, start, end, None, None, hospitals)
+    if list(age_bounds) != AGE_GROUPINGS[DEFAULT_AGE_GROUPING]:
+        rows = rows.assign(**{'Age (bins)': bin_values(rows['Age'], age_bounds)})
+
+    columns = list(dict.fromkeys(column for path in paths for column in path))
+    finest = rows.groupby(columns, observed=True, dropna=False).agg(
+        Patients=('Patient ID', 'count'),
+        Billing=('Billing Amount', 'sum')
+    ).reset_index()
+
+    # High-cardinality levels keep their SUNBURST_TOP_N most frequent values
+    for column in HEAVY_HITTER_COLUMNS:
+        if column in columns:
+            top = top_values(df, column, start, end, hospitals, SUNBURST_TOP_N)
+            if finest[column].nunique() > len(top):
+                finest[column] = group_other(finest[column], top[column])
+    return {
+        tuple(path): finest.groupby(list(path), observed=True)[['Patients', 'Billing']].sum().reset_index()
+        for path in paths
+    }
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES, show_spinner=False)
+def cached_hierarchy_cubes(_df, dataset_version, paths, start, end, hospitals, age_bounds):
+    return build_hierarchy_cubes(_df, paths, start, end, hospitals, age_bounds)
+
+def hierarchy_cubes(df, paths, start, end, hospitals=None, age_bounds=None):
+    # {path tuple: cube} for the sunburst, built together per filter and
+    # age grouping, so switching path or metric is a lookup
+    hospitals = tuple(sorted(hospitals)) if hospitals else ()
+    age_bounds = tuple(age_bounds or AGE_GROUPINGS[DEFAULT_AGE_GROUPING])
+    return shared_result(
+        cached_hierarchy_cubes, build_hierarchy_cubes, df, tuple(tuple(path) for path in paths),
+        start, end, hospitals, age_bounds
+    )
+
+# ------ Approximate mode ------
+# Estimates from a stratified sample: a stratum is one hospital's admissions
+# in one month, and every stratum keeps the same fraction of its rows (at
+# least two, so its variance can be estimated). A sampled row stands for
+# population / sampled rows of its stratum, and the confidence intervals use
+# the stratified variance of each group's total (linearized for means).
+
+def draw_sample(df, fraction=SAMPLE_FRACTION, seed=0):
+    strata = df.groupby(['Hospital', 'Year', 'Month'], observed=True, dropna=False, sort=False).ngroup().to_numpy()
+    population = np.bincount(strata)
+    sampled = np.minimum(population, np.maximum(2, np.round(population * fraction))).astype('int64')
+
+    # The first `sampled` rows of each stratum in a random order
+    order = np.random.default_rng(seed).permutation(len(df))
+    rank = pd.Series(strata[order]).groupby(strata[order], sort=False).cumcount().to_numpy()
+    chosen = np.sort(order[rank < sampled[strata[order]]])
+
+    rows = df.iloc[chosen].reset_index(drop=True)
+    rows['Stratum'] = strata[chosen]
+    return {'rows': rows, 'population': population, 'sampled': sampled}
+
+@st.cache_resource(show_spinner="Drawing the sample...")
+def build_sample(_df, dataset_version):
+    return draw_sample(_df)
+
+def load_sample(df):
+    return shared_result(build_sample, draw_sample, df)
+
+def approximate_mode():
+    # Set by the sidebar toggle on the pages that support it
+    return bool(st.session_state.get('approximate_mode')) and not aggregate_only()
+
+def sample_rows_in(df, start, end, hospitals=None):
+    # Number of sampled rows behind an estimate for this selection
+    rows = period_rows(load_sample(df)['rows'], start, end, hospitals)
+    return rows.stop - rows.start if isinstance(rows, slice) else len(rows)
+
+def approximate_for(df, start, end, hospitals=None):
+    # Whether this page run uses the sample: approximate mode is on and
+    # the sample has enough rows for the selection. Says which one it is.
+    if not approximate_mode():
+        return False
+    sampled = sample_rows_in(df, start, end, hospitals)
+    if sampled < SAMPLE_MIN_ROWS:
+        st.caption(f"Only {sampled:,} sampled patients match this selection, so exact results are shown.")
+        return False
+    st.caption(f"Estimated from {sampled:,} sampled patients ({SAMPLE_FRACTION:.0%} of each hospital's "
+               f"admissions per month). ± gives the 95% confidence interval.")
+    return True
+
+def stratified_variance(factor, n, sum1, sum2):
+    # Variance contribution of the strata to an estimated total, from the
+    # sums of y and y squared over each stratum's sampled rows
+    within = np.divide(sum2 - sum1 ** 2 / n, n - 1, out=np.zeros(len(n)), where=n > 1)
+    return factor * within
+
+def sample_estimates(sample, rows, by, column):
+    # Estimated patients, total and mean of `column` per group of `by` among
+    # the sampled `rows`, each with the half-width of its confidence
+    # interval, plus the number of sampled rows behind it
+    values = rows[column].astype('float64')
+    frame = pd.DataFrame({col: rows[col] for col in by})
+    frame['Stratum'] = rows['Stratum'].to_numpy()
+    frame['n'] = 1
+    frame['m'] = values.notna().astype('int64')
+    frame['s1'] = values.fillna(0)
+    frame['s2'] = frame['s1'] ** 2
+    cells = frame.groupby(by + ['Stratum'], observed=True).sum().reset_index()
+
+    strata = cells['Stratum'].to_numpy()
+    population = sample['population'][strata].astype('float64')
+    n = sample['sampled'][strata].astype('float64')
+    weight = population / n
+    factor = population ** 2 * (1 - n / population) / n
+
+    cells['Patients'] = weight * cells['n']
+    cells['Patients_var'] = stratified_variance(factor, n, cells['n'], cells['n'])
+    cells['Total'] = weight * cells['s1']
+    cells['Total_var'] = stratified_variance(factor, n, cells['s1'], cells['s2'])
+    cells['Weight'] = weight * cells['m']
+    groups = cells.groupby(by, observed=True)[['Patients', 'Patients_var', 'Total', 'Total_var', 'Weight', 'n']].sum()
+
+    # Means are ratios of two totals: their variance is that of the total
+    # of the residuals y - mean, divided by the squared weight
+    mean = groups['Total'] / groups['Weight'].where(groups['Weight'] > 0)
+    ratio = cells[by].merge(mean.rename('Ratio').reset_index(), on=by, how='left')['Ratio'].to_numpy()
+    residual1 = cells['s1'] - ratio * cells['m']
+    residual2 = cells['s2'] - 2 * ratio * cells['s1'] + ratio ** 2 * cells['m']
+    cells['Mean_var'] = stratified_variance(factor, n, residual1, residual2)
+    mean_var = cells.groupby(by, observed=True)['Mean_var'].sum() / groups['Weight'] ** 2
+
+    return pd.DataFrame({
+        'Patients': groups['Patients'].round().astype('int64'),
+        'Patients_ci': CONFIDENCE_Z * np.sqrt(groups['Patients_var']),
+        'Total': groups['Total'],
+        'Total_ci': CONFIDENCE_Z * np.sqrt(groups['Total_var']),
+        'Mean': mean,
+        'Mean_ci': CONFIDENCE_Z * np.sqrt(mean_var),
+        'Sampled': groups['n']
+    }).reset_index()
+
+def sample_period_estimates(sample, by, column, start, end, hospitals, bins):
+    rows = slice_period(sample['rows'], start, end, hospitals)
+    if bins is not None:
+        rows = rows.assign(**{f'{by[0]} (bins)': bin_values(rows[by[0]], bins)})
+        by = [f'{by[0]} (bins)']
+    return sample_estimates(sample, rows, by, column)
+
+def sample_comparison(df, by, column, mean_name, current_start, current_end, prev_start, prev_end, hospitals, bins):
+    sample = load_sample(df)
+    periods = {'current': (current_start, current_end)}
+    if prev_start is not None and prev_end is not None:
+        periods['prev'] = (prev_start, prev_end)
+    estimates = {
+        period: sample_period_estimates(sample, list(by), column, start, end, hospitals, bins)
+        for period, (start, end) in periods.items()
+    }
+
+    key = [f'{by[0]} (bins)'] if bins is not None else list(by)
+    points = {period: table[key + ['Patients', 'Mean']].rename(columns={'Mean': mean_name})
+              for period, table in estimates.items()}
+    comparison = compare_tables(points['current'], points.get('prev'), key, how='left')
+
+    # The interval half-widths go next to the estimates
+    for period, table in estimates.items():
+        intervals = table[key + ['Patients_ci', 'Mean_ci', 'Sampled']].rename(columns={
+            'Patients_ci': f'Patients_ci_{period}', 'Mean_ci': f'{mean_name}_ci_{period}', 'Sampled': f'Sampled_{period}'
+        })
+        comparison = comparison.merge(intervals, on=key, how='left')
+    return comparison
+
+@st.cache_data(max_entries=FILTER_CACHE_ENTRIES, show_spinner=False)
+def cached_sample_comparison(_df, dataset_version, by, column, mean_name, current_start, current_end,
+                             prev_start, prev_end, hospitals, bins):
+    return sample_comparison(_df, by, column, mean_name, current_start, current_end,
+                             prev_start, prev_end, hospitals, bins)
+
+def compare_periods_sampled(df, by, column, mean_name, current_start, current_end, prev_start, prev_end,
+                            hospitals=None, bins=None):
+    # Estimated patients and mean of `column` per group of `by` in both
+    # periods, laid out like compare_tables (how='left') with the measures
+    # Patients and `mean_name`, plus <measure>_ci_<period> half-widths of
+    # the confidence intervals and Sampled_<period> row counts. `bins`
+    # works as in dimension_breakdown.
+    hospitals = tuple(sorted(hospitals)) if hospitals else ()
+    return shared_result(
+        cached_sample_comparison, sample_comparison, df, tuple(by), column, mean_name, current_start, current_end,
+        prev_start, prev_end, hospitals, tuple(bins) if bins is not None else None
+    )
+
+def sample_histogram(df, column, start, end, hospitals, edges):
+    # Estimated number of patients per bin of `column` between `edges`
+    # (the exact histogram's, such as billing_edges), with the interval
+    # half-widths; returns (counts, intervals)
+    bins = len(edges) - 1
+    sample = load_sample(df)
+    rows = slice_period(sample['rows'], start, end, hospitals)
+    values = rows[column].astype('float64')
+    rows = rows[values.notna()]
+    values = values[values.notna()].to_numpy()
+    codes = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, bins - 1)
+    estimates = sample_estimates(sample, rows.assign(Bin=codes), ['Bin'], column).set_index('Bin')
+    estimates = estimates.reindex(range(bins), fill_value=0)
+    return estimates['Patients'].to_numpy(), estimates['Patients_ci'].to_numpy()
+
+@st.cache_resource(show_spinner="Loading the dataset...")
+def load_shared_dataset(dataset_version):
+    # The one copy of the patient table in this process. Callers never get
+    # this object itself, only load_data's read-only views of it.
+    url = DATA_PATH
+    parquet_path, meta_path = columnar_cache_paths(url)
+    timings = {}
+    report = None
+
+    df = None
+
+    # Fast path: the typed columnar copy, as long as the CSV has not changed
+    started = time.perf_counter()
+    if os.path.exists(parquet_path) and columnar_cache_is_fresh(url, meta_path):
+        try:
+            df = pd.read_parquet(parquet_path)
+            with open(meta_path) as f:
+                report = json.load(f).get('load_report')
+        except (ImportError, OSError, ValueError):
+            df = None
+
+    if df is not None:
+        timings['read_parquet'] = time.perf_counter() - started
+        report = dict(report or {}, source='parquet', csv_seconds=(report or {}).get('seconds'))
+    else:
+        df, quarantined = parse_source_csv(url, timings)
+        write_quarantine(quarantined, url)
+
+        started = time.perf_counter()
+        df = apply_schema(df)
+        timings['apply_schema'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        df = sort_by_admission(df)
+        timings['sort'] = time.perf_counter() - started
+
+        report = {'source': 'csv', 'rows': len(df), 'quarantined': quarantine_counts(quarantined)}
+
+        started = time.perf_counter()
+        write_columnar_cache(df, url, dict(report, seconds=dict(timings)))
+        timings['write_cache'] = time.perf_counter() - started
+
+    if FLOAT32_BILLING:
+        df['Billing Amount'] = df['Billing Amount'].astype('float32')
+
+    # The default age groups are added once here instead of on every page run
+    started = time.perf_counter()
+    df['Age (bins)'] = bin_values(df['Age'], AGE_GROUPINGS[DEFAULT_AGE_GROUPING])
+    timings['age_bins'] = time.perf_counter() - started
+
+    # Identifies this build of the dataset in the keys of derived caches
+    stamp_dataset(df, dataset_version)
+
+    # Where the load time went and how many rows were set aside
+    report['seconds'] = timings
+    df.attrs['load_report'] = report
+
+    return df
+
+def load_data():
+    # Each call gets its own DataFrame object over the shared column
+    # buffers, so nothing is copied or unpickled per rerun. With
+    # copy-on-write, assigning to the returned frame (or to a slice of it)
+    # copies just what is written and the shared table never changes.
+    # Reloads by itself when the CSV changes.
+    return load_shared_dataset(source_version(DATA_PATH)).copy(deep=False)
+
+def source_version(url):
+    return f"{CACHE_VERSION}-{file_version(url)}-{FLOAT32_BILLING:d}"
+
+def file_version(url):
+    stat = os.stat(url)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+def aggregate_only():
+    return LOAD_MODE == 'stream'
+
+def append_quarantine(quarantine_file, rejected, csv_path):
+    # Appends a chunk's rejected rows to the quarantine file, opening it
+    # (and replacing the last run's) on the first one. Returns the open
+    # file, or False once it could not be written.
+    if quarantine_file is False:
+        return False
+    try:
+        if quarantine_file is None:
+            quarantine_file = open(quarantine_path(csv_path), "w", newline="")
+            rejected.to_csv(quarantine_file, index=False)
+        else:
+            rejected.to_csv(quarantine_file, index=False, header=False)
+        return quarantine_file
+    except OSError:
+        if quarantine_file is not None:
+            quarantine_file.close()
+        return False
+
+def fold_chunk(chunk, dimensions, partials):
+    # Adds the chunk's partial cubes to `partials`, merging each cube's
+    # list into one every MERGE_CHUNKS chunks. Returns the rows folded.
+    if FLOAT32_BILLING:
+        chunk['Billing Amount'] = chunk['Billing Amount'].astype('float32')
+    billed = chunk[chunk['Billing Amount'].notna()]
+    billing = billed['Billing Amount'].to_numpy(dtype='float64')
+    billed = billed.assign(**{'Billing Bin': np.floor_divide(billing, BILLING_BIN_WIDTH).astype('int64')})
+
+    for name, cube_dimensions in dimensions.items():
+        partials[name].append(aggregate_cube(billed if name == 'billing_cube' else chunk, cube_dimensions))
+        if len(partials[name]) > MERGE_CHUNKS:
+            partials[name] = [merge_cubes(partials[name], cube_dimensions)]
+    return len(chunk)
+
+def chunk_extent(chunk, billing_range, locations):
+    # The billing range and hospital locations seen so far, with the chunk's
+    billing = chunk['Billing Amount'].dropna().to_numpy(dtype='float64')
+    if len(billing):
+        billing_range = (min(billing_range[0], billing.min()), max(billing_range[1], billing.max()))
+
+    chunk_locations = chunk[LOCATION_COLUMNS].drop_duplicates('Hospital')
+    if locations is None:
+        return billing_range, chunk_locations
+    return billing_range, pd.concat([locations, chunk_locations]).drop_duplicates('Hospital')
+
+def stream_aggregates(url=DATA_PATH, chunk_size=CHUNK_SIZE):
+    # Folds the CSV into the daily cube, the breakdown cubes and the
+    # billing cube one chunk at a time. Only the chunk being read, the
+    # partial cubes of the last MERGE_CHUNKS chunks and the merged
+    # aggregates are ever held in memory. Rejected rows are appended to the
+    # quarantine file as they are found; only their counts are kept.
+    started = time.perf_counter()
+    dimensions = {'daily_cube': CUBE_DIMENSIONS, 'billing_cube': ['Date of Admission', 'Hospital', 'Billing Bin']}
+    dimensions.update({column: ['Date of Admission', 'Hospital', column] for column in BREAKDOWN_COLUMNS})
+    partials = {name: [] for name in dimensions}
+    billing_range = (np.inf, -np.inf)
+    locations = None
+    quarantined = {}
+    quarantine_file = None
+    rows = 0
+
+    try:
+        for chunk in pd.read_csv(url, usecols=STREAM_COLUMNS, chunksize=chunk_size):
+            chunk, rejected = parse_dates(chunk)
+            chunk = add_derived_columns(chunk)
+            if len(rejected):
+                quarantined = add_quarantine_counts(quarantined, rejected)
+                quarantine_file = append_quarantine(quarantine_file, rejected, url)
+            rows += fold_chunk(chunk, dimensions, partials)
+            billing_range, locations = chunk_extent(chunk, billing_range, locations)
+    finally:
+        if quarantine_file:
+            quarantine_file.close()
+    if quarantine_file is None:
+        write_quarantine(pd.DataFrame(), url)
+
+    cubes = {name: merge_cubes(partials[name], cube_dimensions) for name, cube_dimensions in dimensions.items()}
+
+    # Same dtypes and cell order as the cubes built from the patient table,
+    # with the hospitals of the daily cube everywhere
+    for name, cube_dimensions in dimensions.items():
+        cube = categorize(cubes[name], [col for col in cube_dimensions[1:] if col in CATEGORICAL_SCHEMA])
+        cubes[name] = cube.sort_values(cube_dimensions, kind='stable', ignore_index=True)
+    hospitals = cubes['daily_cube']['Hospital'].cat.categories
+    for name in dimensions:
+        cubes[name]['Hospital'] = cubes[name]['Hospital'].cat.set_categories(hospitals)
+    locations = categorize(locations.reset_index(drop=True), ['Hospital'])
+    locations['Hospital'] = locations['Hospital'].cat.set_categories(hospitals)
+    locations = locations.sort_values('Hospital', ignore_index=True)
+    if not np.isfinite(billing_range[0]):
+        billing_range = (np.nan, np.nan)
+
+    report = {
+        'source': 'csv (streamed)',
+        'rows': rows,
+        'quarantined': quarantined,
+        'seconds': {'stream': time.perf_counter() - started}
+    }
+
+    return {
+        'daily_cube': cubes['daily_cube'],
+        'breakdown_cubes': {column: cubes[column] for column in BREAKDOWN_COLUMNS},
+        'billing_cube': cubes['billing_cube'],
+        'billing_range': billing_range,
+        'locations': locations,
+        'rows': rows,
+        'load_report': report
+    }
+
+@st.cache_resource(show_spinner="Streaming the dataset into aggregates...")
+def build_aggregates(dataset_version):
+    aggregates = stream_aggregates(DATA_PATH, CHUNK_SIZE)
+    stamp_dataset(aggregates['daily_cube'], f"{dataset_version}-daily-cube")
+    for column, cube in aggregates['breakdown_cubes'].items():
+        stamp_dataset(cube, f"{dataset_version}-{column}-cube")
+    stamp_dataset(aggregates['billing_cube'], f"{dataset_version}-billing-cube")
+    aggregates['catalog'] = make_catalog(aggregates['daily_cube'], aggregates['locations'], aggregates['billing_range'])
+    return aggregates
+
+def load_aggregates():
+    # Rebuilt whenever the CSV changes, like the columnar cache
+    return build_aggregates(source_version(DATA_PATH) + "-stream")
+
+def object_bytes(value):
+    # Approximate memory held by a session state value
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(value, pd.DataFrame) else int(usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(object_bytes(k) + object_bytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(object_bytes(v) for v in value)
+    return sys.getsizeof(value)
+
+@st.cache_resource(show_spinner=False)
+def session_memory_registry():
+    # Process-wide: session id -> what that session held at its last run
+    return {'lock': threading.Lock(), 'sessions': {}}
+
+def current_session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else 'no-session'
+
+def record_session_memory(page):
+    sizes = {key: object_bytes(st.session_state[key]) for key in list(st.session_state.keys())}
+    registry = session_memory_registry()
+    now = time.time()
+    with registry['lock']:
+        registry['sessions'][current_session_id()] = {
+            'page': page,
+            'keys': len(sizes),
+            'bytes': sum(sizes.values()),
+            'largest_key': max(sizes, key=sizes.get) if sizes else '',
+            'seen': now
+        }
+        for session, entry in list(registry['sessions'].items()):
+            if now - entry['seen'] > SESSION_IDLE_SECONDS:
+                del registry['sessions'][session]
+
+def session_memory_report():
+    registry = session_memory_registry()
+    now = time.time()
+    with registry['lock']:
+        rows = [
+            {'Session': session[:8], 'Page': entry['page'], 'Keys': entry['keys'],
+             'Bytes': entry['bytes'], 'Largest key': entry['largest_key'],
+             'Idle (s)': int(now - entry['seen'])}
+            for session, entry in registry['sessions'].items()
+        ]
+    return pd.DataFrame(rows, columns=['Session', 'Page', 'Keys', 'Bytes', 'Largest key', 'Idle (s)'])
+
+def enter_page(page):
+    # Marks `page` as the current page and records the session's footprint
+    # for the memory table
+    st.session_state['current_page'] = page
+    record_session_memory(page)
+    if PROFILE or PROFILE_LOG:
+        st.session_state['section_timings'] = {'page': page, 'open': None, 'done': []}
+        start_section('Sidebar & filters')
+
+    if SHOW_SESSION_MEMORY:
+        with st.sidebar.expander("Session memory"):
+            st.dataframe(session_memory_report(), hide_index=True)
+
+# ------ Section timings ------
+# Each page is split into named sections with start_section(). Time is
+# booked as compute until start_figure() marks that a plotly figure is being
+# built, and the time inside timed_chart() as render. All of it is a no-op
+# unless HEALTHCARE_PROFILE or HEALTHCARE_PROFILE_LOG is set.
+
+profile_log_lock = threading.Lock()
+
+def section_timings():
+    # Fragment reruns skip enter_page, so the state may have to be created here
+    if 'section_timings' not in st.session_state:
+        st.session_state['section_timings'] = {
+            'page': st.session_state.get('current_page'), 'open': None, 'done': []
+        }
+    return st.session_state['section_timings']
+
+def book_section_time(section, now):
+    phase = 'figure_ms' if section['in_figure'] else 'compute_ms'
+    section[phase] += (now - section['mark']) * 1000
+    section['mark'] = now
+
+def start_section(name):
+    if not (PROFILE or PROFILE_LOG):
+        return
+    end_section()
+    section_timings()['open'] = {
+        'section': name, 'mark': time.perf_counter(), 'in_figure': False,
+        'compute_ms': 0.0, 'figure_ms': 0.0, 'render_ms': 0.0, 'charts': 0, 'payload_bytes': 0
+    }
+
+def start_figure():
+    section = section_timings()['open'] if (PROFILE or PROFILE_LOG) else None
+    if section is not None:
+        book_section_time(section, time.perf_counter())
+        section['in_figure'] = True
+
+def timed_chart(fig, **kwargs):
+    # st.plotly_chart, with the figure's JSON size and the time taken to
+    # hand it to the browser booked against the open section
+    section = section_timings()['open'] if (PROFILE or PROFILE_LOG) else None
+    if section is None:
+        return st.plotly_chart(fig, **kwargs)
+
+    book_section_time(section, time.perf_counter())
+    # Serialising the figure a second time is not part of the page's cost
+    section['payload_bytes'] += len(fig.to_json().encode())
+    start = time.perf_counter()
+    result = st.plotly_chart(fig, **kwargs)
+    now = time.perf_counter()
+    section['render_ms'] += (now - start) * 1000
+    section['charts'] += 1
+    section['mark'] = now
+    section['in_figure'] = False
+    return result
+
+def end_section():
+    if not (PROFILE or PROFILE_LOG):
+        return
+    timings = section_timings()
+    section = timings['open']
+    if section is None:
+        return
+    timings['open'] = None
+    book_section_time(section, time.perf_counter())
+
+    entry = {'page': timings['page'], 'section': section['section']}
+    for key in ['compute_ms', 'figure_ms', 'render_ms']:
+        entry[key] = round(section[key], 2)
+    entry['total_ms'] = round(section['compute_ms'] + section['figure_ms'] + section['render_ms'], 2)
+    entry['charts'] = section['charts']
+    entry['payload_bytes'] = section['payload_bytes']
+    timings['done'].append(entry)
+    # Fragment reruns append without a full run to reset the list
+    del timings['done'][:-100]
+
+    if PROFILE_LOG:
+        record = dict(entry, time=time.strftime('%Y-%m-%dT%H:%M:%S'), session=current_session_id())
+        with profile_log_lock, open(PROFILE_LOG, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+def show_section_timings():
+    # Called last on every page: closes the open section and, with
+    # HEALTHCARE_PROFILE=1, lists this run's sections in the sidebar
+    end_section()
+    if PROFILE:
+        timings = pd.DataFrame(section_timings()['done'])
+        with st.sidebar.expander("Section timings"):
+            if timings.empty:
+                st.write("No sections recorded.")
+            else:
+                st.dataframe(timings.drop(columns='page'), hide_index=True)
+
+# The dashboard pages as (title, script, URL path). Home.py routes between
+# them with st.navigation, so switching pages reruns the script in the same
+# session instead of reloading the browser.
+APP_PAGES = [
+    ('Executive Summary', 'app_pages/0_Executive_Summary.py', ''),
+    ('Patient Demographics', 'app_pages/1_Patient_Demographics.py', 'Patient_Demographics'),
+    ('Hospital Performance', 'app_pages/2_Hospital_Performance.py', 'Hospital_Performance'),
+    ('Insurance & Billing', 'app_pages/3_Insurance_&_Billing.py', 'Insurance_&_Billing'),
+    ('Trends & Forecasting', 'app_pages/4_Trends_&_Forecasting.py', 'Trends_&_Forecasting')
+]
+
+# Widgets whose values survive a page switch. Streamlit drops the state of
+# widgets that are not rendered in a run; keep_widget_state writes these
+# back before every run so the filters and page controls stay as they were.
+PERSISTENT_WIDGET_KEYS = [
+    'time_period_selector', 'hospital_selector',
+    'sunburst_inner_ring', 'sunburst_agg', 'highlight_underperforming',
+    'age_grouping', 'age_custom_bounds', 'approximate_mode'
+]
+
+def keep_widget_state():
+    for key in PERSISTENT_WIDGET_KEYS:
+        if key in st.session_state:
+            st.session_state[key] = st.session_state[key]
+
+def create_navigation():
+    # The top bar (create_page_navigation) replaces Streamlit's own menu
+    pages = [
+        st.Page(script, title=title, url_path=url_path or None, default=not url_path)
+        for title, script, url_path in APP_PAGES
+    ]
+    return st.navigation(pages, position='hidden')
+
 def create_page_navigation():
     # Get current page path
     current_page = st.session_state.get('current_page', 'Executive Summary')
     
-    # Create navigation with a single continuous line
-    st.markdown(f"""
-    <div class="stTabs">
-        <div data-baseweb="tab-list">
-            <a target="_self" href="/" class="nav-link" data-active="{'true' if current_page == 'Executive Summary' else 'false'}">Executive Summary</a>
-            <a target="_self" href="/Patient_Demographics" class="nav-link" data-active="{'true' if current_page == 'Patient Demographics' else 'false'}">Patient Demographics</a>
-            <a target="_self" href="/Hospital_Performance" class="nav-link" data-active="{'true' if current_page == 'Hospital Performance' else 'false'}">Hospital Performance</a>
-            <a target="_self" href="/Insurance_&_Billing" class="nav-link" data-active="{'true' if current_page == 'Insurance & Billing' else 'false'}">Insurance & Billing</a>
-            <a target="_self" href="/Trends_&_Forecasting" class="nav-link" data-active="{'true' if current_page == 'Trends & Forecasting' else 'false'}">Trends & Forecasting</a>
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
+    # Page links switch pages inside the session; the active one gets its
+    # own key so the stylesheet can underline it
+    with st.container(key='page-nav', horizontal=True):
+        for i, (title, script, _) in enumerate(APP_PAGES):
+            with st.container(key='nav-active' if title == current_page else f'nav-{i}', width='content'):
+                st.page_link(script, label=title)
 
     # Add the help box after navigation
     if 'show_help' in st.session_state and st.session_state.show_help:
@@ -120,7 +1833,7 @@ def create_page_navigation():
             #if st.button("", key="close_help", icon=":material/close:", help="Close the help section",use_container_width=True):
             #    st.session_state.show_help = False
 
-def process_date_ranges(scenario, max_date):   
+def process_date_ranges(scenario, max_date, min_date):   
 
     prev_custom_start = None
 
@@ -212,8 +1925,8 @@ def process_date_ranges(scenario, max_date):
         # Date range picker for custom date selection
         date_range = st.sidebar.date_input(
             "Select Date Range",
-            value=(max_date - timedelta(days=180), max_date),
-            min_value=pd.Timestamp('2020-01-01').date(),  # Adjust based on your data
+            value=(max(max_date - timedelta(days=180), min_date), max_date),
+            min_value=min_date.date(),
             max_value=max_date.date()
         )
         if len(date_range) == 2:
@@ -253,6 +1966,13 @@ def process_date_ranges(scenario, max_date):
     return current_start, current_end, prev_start, prev_end, comparison_label, prev_custom_start
 
 def initialize_page():
+    # The shared dataset relies on copy-on-write (the default from pandas 3)
+    # to keep page code from writing into it. Set here rather than on import,
+    # so scripts that only borrow helpers from this module keep their pandas
+    # behaviour.
+    if int(pd.__version__.split('.')[0]) < 3:
+        pd.set_option('mode.copy_on_write', True)
+
     # Set page configuration
     st.set_page_config(
         page_title="Healthcare Analytics Dashboard",
@@ -293,55 +2013,59 @@ def create_sidebar(df):
         key="time_period_selector"
     )
 
+    # Hospitals and dates come from the catalog instead of scanning rows
+    catalog = load_catalog(df)
+
     # Hospital multiselect
     # Get unique hospitals and add "All" option
-    hospitals = sorted(df['Hospital'].unique().tolist())
+    hospitals = catalog['dimensions']['Hospital']
     selected_hospitals = st.sidebar.multiselect(
         "Hospital:",
         options=hospitals,
         default= None,
-        placeholder= 'All'
+        placeholder= 'All',
+        key="hospital_selector"
     )
 
-    # Process the hospital filter
-    if "All" in selected_hospitals or not selected_hospitals:
-        filtered_df = df  # No filtering if "All" is selected or nothing is selected
-    else:
-        filtered_df = df[df['Hospital'].isin(selected_hospitals)]
+    # Process the hospital filter: an empty list means all hospitals
+    if "All" in selected_hospitals:
+        selected_hospitals = []
+
+    # Pages with row-level tables can estimate them from the sample
+    if df is not None and st.session_state.get('current_page') in APPROXIMATE_PAGES:
+        st.sidebar.toggle(
+            "Approximate results",
+            key="approximate_mode",
+            help=f"Estimate the tables from a {SAMPLE_FRACTION:.0%} sample of each hospital's admissions "
+                 "per month, with 95% confidence intervals. Turn off for exact results."
+        )
 
 
     # Get current page from session state (default to empty string if not set)
     current_page = st.session_state.get('current_page', 'Executive Summary')
 
     if current_page == 'Trends & Forecasting':
-        
-        max_date = df['Date of Admission'].max()
-        current_month = max_date.month
-        current_year = max_date.year
-        day_of_month = max_date.day
-        
-        # If we're in the early days of the month (< 7), consider the previous month as the last complete one
-        if day_of_month < 25:
-            # Calculate the last day of the previous month
-            if current_month == 1:  # January
-                prev_month = 12
-                prev_year = current_year - 1
-            else:
-                prev_month = current_month - 1
-                prev_year = current_year
-                
-            # Last day of previous month
-            last_day = pd.Timestamp(year=prev_year, month=prev_month+1, day=1) - timedelta(days=1)
-            max_date = last_day  # Use the last day of previous month as max_date
+        # Trends only shows complete months: if the data ends early in a
+        # month, the previous month is the last complete one
+        max_date = catalog['last_complete_month_end']
     else:
-        max_date = df['Date of Admission'].max()
+        max_date = catalog['max_date']
 
     # Process date ranges based on scenario and current page
     current_start, current_end, prev_start, prev_end, comparison_label, prev_custom_start = process_date_ranges(
-        scenario, max_date
+        scenario, max_date, catalog['min_date']
     )
 
 
+    # Rows set aside at load time are reported rather than silently dropped
+    report = df.attrs.get('load_report') if df is not None else load_aggregates().get('load_report')
+    quarantined = sum(report['quarantined'].values()) if report else 0
+    if quarantined:
+        st.sidebar.caption(
+            f"{quarantined:,} rows with invalid dates were left out "
+            f"(see {os.path.basename(quarantine_path(DATA_PATH))})."
+        )
+
     help_container = st.sidebar.container(key='helpBlock')
     help_cols = help_container.columns([3,1])
     help_cols[0].markdown("<p style='margin-top: 7px; margin-bottom:0'>More info:</p>", unsafe_allow_html=True)
@@ -353,5 +2077,5 @@ def create_sidebar(df):
 
 
 
-    return current_start, current_end, prev_start, prev_end, comparison_label, prev_custom_start, filtered_df
+    return current_start, current_end, prev_start, prev_end, comparison_label, prev_custom_start, selected_hospitals
     
\ No newline at end of file